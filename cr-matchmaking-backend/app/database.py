@@ -1,13 +1,104 @@
+import uuid
 from collections.abc import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import ORMExecuteState, Session
 
 from app.config import settings
+from app.utils import metrics, redis_client, sql_profiler
 
-engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEBUG)
-async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+READ_PIN_PREFIX = "db_pin:"
+
+
+class PrimarySession(Session):
+    """Session bound to the primary; records whether it committed a write."""
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _mark_flush(session: Session, flush_context: object) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _mark_dml(orm_execute_state: ORMExecuteState) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _mark_commit(session: Session) -> None:
+    if session.info.pop("wrote", False):
+        session.info["committed_write"] = True
+
+
+@event.listens_for(PrimarySession, "after_rollback")
+def _clear_write(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=settings.DEBUG,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
+metrics.instrument_pool(engine, "primary")
+sql_profiler.install(engine)
+async_session = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=PrimarySession,
+    expire_on_commit=False,
+)
+
+replica_engine: AsyncEngine | None = None
+replica_session: async_sessionmaker[AsyncSession] | None = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        settings.DATABASE_REPLICA_URL,
+        echo=settings.DEBUG,
+        pool_size=settings.DB_REPLICA_POOL_SIZE,
+        max_overflow=settings.DB_REPLICA_MAX_OVERFLOW,
+        pool_recycle=settings.DB_REPLICA_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_REPLICA_POOL_PRE_PING,
+    )
+    metrics.instrument_pool(replica_engine, "replica")
+    sql_profiler.install(replica_engine)
+    replica_session = async_sessionmaker(
+        replica_engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+
+async def pin_to_primary(user_id: uuid.UUID) -> None:
+    """Send this user's reads to the primary until the replicas catch up."""
+    redis = redis_client.redis_client
+    if redis is not None:
+        await redis.set(
+            f"{READ_PIN_PREFIX}{user_id}",
+            "1",
+            px=int(settings.DB_READ_YOUR_WRITES_SECONDS * 1000),
+        )
+
+
+async def is_pinned_to_primary(user_id: uuid.UUID) -> bool:
+    redis = redis_client.redis_client
+    if redis is None:
+        return True
+    return bool(await redis.exists(f"{READ_PIN_PREFIX}{user_id}"))
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
+        # get_current_user records who the request acts for
+        user_id = session.info.get("user_id")
+        if user_id is not None and session.info.get("committed_write"):
+            await pin_to_primary(user_id)
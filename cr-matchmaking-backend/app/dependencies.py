@@ -1,22 +1,24 @@
+import uuid
+from collections.abc import AsyncGenerator
+
 from fastapi import Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from redis.asyncio import Redis
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import database
 from app.database import get_db
 from app.models.user import User
-from app.services import auth_service
+from app.services import auth_service, user_cache_service
 from app.utils.exceptions import AccountNotVerified, AppException
+from app.utils.redis_client import get_redis
 
 bearer_scheme = HTTPBearer()
+optional_bearer_scheme = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: AsyncSession = Depends(get_db),
-) -> User:
-    user_id = auth_service.decode_access_token(credentials.credentials)
-
+async def _load_user(db: AsyncSession, user_id: uuid.UUID) -> User:
     result = await db.execute(select(User).where(User.user_id == user_id))
     user = result.scalar_one_or_none()
 
@@ -24,13 +26,67 @@ async def get_current_user(
         raise AppException(
             code="USER_NOT_FOUND", message="User not found", status_code=401
         )
+    return user
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+) -> User:
+    """The authenticated user, for reading.
+
+    May be a detached copy from the user cache, without the password hash or
+    balance; handlers that modify the user take get_current_user_row.
+    """
+    user_id = auth_service.decode_access_token(credentials.credentials)
+    # Lets get_db pin this user's reads to the primary after a write
+    db.info["user_id"] = user_id
+
+    cached, generation = await user_cache_service.get_user(redis, user_id)
+    if cached is not None:
+        return cached
 
+    user = await _load_user(db, user_id)
+    await user_cache_service.cache_user(redis, user, generation)
     return user
 
 
+async def get_current_user_row(
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """The authenticated user as a row loaded in the request's session."""
+    if user in db:
+        return user
+    return await _load_user(db, user.user_id)
+
+
 async def require_verified_cr_account(
     user: User = Depends(get_current_user),
 ) -> User:
     if not user.cr_player_verified:
         raise AccountNotVerified()
     return user
+
+
+async def get_read_db(
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_bearer_scheme),
+) -> AsyncGenerator[AsyncSession, None]:
+    """Session for read-only handlers, served by the replica when configured.
+
+    Users who wrote recently are kept on the primary so they read their own
+    writes despite replication lag.
+    """
+    session_factory = database.replica_session or database.async_session
+    if database.replica_session is not None and credentials is not None:
+        try:
+            user_id = auth_service.decode_access_token(credentials.credentials)
+        except AppException:
+            # Authentication itself is left to get_current_user
+            user_id = None
+        if user_id is not None and await database.is_pinned_to_primary(user_id):
+            session_factory = database.async_session
+
+    async with session_factory() as session:
+        yield session
@@ -1,33 +1,67 @@
-from contextlib import asynccontextmanager
+import asyncio
 from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
+# Import all models so Base.metadata knows about them
+import app.models.match  # noqa: F401
+import app.models.transaction  # noqa: F401
+import app.models.user  # noqa: F401
+from app import database
 from app.config import settings
 from app.database import engine
+from app.middleware.idempotency import IdempotencyMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.query_profiler import QueryProfilerMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
 from app.models.base import Base
-from app.routers import auth, users
+from app.routers import auth, balance, events, matches, matchmaking, users
+from app.services import (
+    battle_poller_service,
+    cr_api_service,
+    event_service,
+    job_service,
+    match_expiry_service,
+    matchmaking_service,
+    trophy_refresh_service,
+)
+from app.utils import metrics
 from app.utils.exceptions import AppException
 from app.utils.redis_client import close_redis, init_redis
 
-# Import all models so Base.metadata knows about them
-import app.models.user  # noqa: F401
-import app.models.match  # noqa: F401
-import app.models.transaction  # noqa: F401
-
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Startup
     await init_redis()
+    await cr_api_service.init_client()
     if settings.DEBUG:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+    background_tasks = [
+        asyncio.create_task(matchmaking_service.run_matcher()),
+        asyncio.create_task(match_expiry_service.run_sweeper()),
+        asyncio.create_task(battle_poller_service.run_poller()),
+        asyncio.create_task(trophy_refresh_service.run_refresher()),
+        asyncio.create_task(event_service.run_listener()),
+    ]
+    if settings.JOB_WORKERS_IN_APP:
+        background_tasks.append(asyncio.create_task(job_service.run_worker()))
     yield
     # Shutdown
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    await cr_api_service.close_client()
     await close_redis()
     await engine.dispose()
+    if database.replica_engine is not None:
+        await database.replica_engine.dispose()
+    metrics.mark_process_dead()
 
 
 app = FastAPI(
@@ -36,25 +70,53 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Innermost, so replayed responses still count against rate limits
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=(
+        "/api/matchmaking/queue",
+        "/api/balance/deposit",
+        "/api/balance/withdraw",
+    ),
+)
+app.add_middleware(
+    RateLimitMiddleware,
+    route_limits={
+        "/api/auth/login": (
+            settings.RATE_LIMIT_AUTH_REQUESTS,
+            settings.RATE_LIMIT_AUTH_PERIOD,
+        ),
+        "/api/auth/register": (
+            settings.RATE_LIMIT_AUTH_REQUESTS,
+            settings.RATE_LIMIT_AUTH_PERIOD,
+        ),
+    },
+    exempt_paths=("/health", "/metrics"),
+)
+app.add_middleware(QueryProfilerMiddleware)
+# Added last so it wraps everything, including rate-limited requests
+app.add_middleware(MetricsMiddleware)
+
 
 @app.exception_handler(AppException)
 async def app_exception_handler(request: Request, exc: AppException) -> JSONResponse:
-    return JSONResponse(
-        status_code=exc.status_code,
-        content={
-            "error": {
-                "code": exc.code,
-                "message": exc.message,
-                "details": exc.details,
-            }
-        },
-    )
+    return JSONResponse(status_code=exc.status_code, content=exc.to_dict())
 
 
 app.include_router(auth.router)
 app.include_router(users.router)
+app.include_router(matchmaking.router)
+app.include_router(events.router)
+app.include_router(balance.router)
+app.include_router(matches.router)
 
 
 @app.get("/health")
 async def health() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
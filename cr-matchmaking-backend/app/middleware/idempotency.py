@@ -0,0 +1,300 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import time
+import uuid
+from typing import Any
+
+import orjson
+from redis.asyncio import Redis
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.middleware.rate_limit import user_id_from_scope
+from app.utils import redis_client
+from app.utils.exceptions import (
+    AppException,
+    IdempotencyKeyReused,
+    IdempotentRequestInProgress,
+    InvalidIdempotencyKey,
+)
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_PREFIX = "idem:"
+HEADER = b"idempotency-key"
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+
+STATE_PENDING = "pending"
+STATE_DONE = "done"
+
+# The scripts below act on the key only while it still holds the pending
+# record of the claim whose token is ARGV[1]; a claim that expired and was
+# taken over by a retry must not overwrite or drop the new owner's record.
+_IF_CLAIMED = """
+local raw = redis.call('GET', KEYS[1])
+if not raw or cjson.decode(raw)['token'] ~= ARGV[1] then
+    return 0
+end
+"""
+STORE_IF_CLAIMED_LUA = (
+    _IF_CLAIMED
+    + """
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+)
+RELEASE_IF_CLAIMED_LUA = (
+    _IF_CLAIMED
+    + """
+return redis.call('DEL', KEYS[1])
+"""
+)
+RENEW_IF_CLAIMED_LUA = (
+    _IF_CLAIMED
+    + """
+return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+"""
+)
+
+
+def _fingerprint(scope: Scope, body: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{scope['method']} {scope['path']}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _idempotency_key(scope: Scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name == HEADER:
+            key = value.decode("latin-1")
+            if not 0 < len(key) <= 255 or not key.isprintable():
+                raise InvalidIdempotencyKey()
+            return key
+    return None
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """Runs a keyed request at most once and replays its response to retries.
+
+    Applies to POSTs to ``paths`` that carry an Idempotency-Key header and a
+    valid bearer token; keys are scoped to the user. The first request takes
+    the key in Redis with SET NX under a token of its own, renewing the claim
+    while it runs, and its response (status, headers, body) is stored for
+    IDEMPOTENCY_TTL_SECONDS, then replayed byte for byte. The store and the
+    release only happen while the key still holds that claim. A
+    duplicate arriving while the first is still running waits for that
+    response instead of running the endpoint again. Reusing a key with a
+    different body is rejected. Server errors are not stored, so a retry
+    after one runs the request again. If Redis is unavailable, requests run
+    normally.
+    """
+
+    def __init__(self, app: ASGIApp, paths: tuple[str, ...] = ()):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            key = _idempotency_key(scope)
+        except AppException as exc:
+            await self._error(exc, scope, receive, send)
+            return
+        user_id = user_id_from_scope(scope)
+        redis = redis_client.redis_client
+        if key is None or user_id is None or redis is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        fingerprint = _fingerprint(scope, body)
+        redis_key = f"{IDEMPOTENCY_PREFIX}{user_id}:{key}"
+        try:
+            token = uuid.uuid4().hex
+            stored = await self._claim_or_wait(redis, redis_key, fingerprint, token)
+        except AppException as exc:
+            await self._error(exc, scope, receive, send)
+            return
+        except Exception:
+            logger.exception("Idempotency check failed, running request")
+            await self.app(scope, self._replay_body(body), send)
+            return
+
+        if stored is not None:
+            await self._replay(stored, send)
+            return
+        await self._run_and_store(
+            scope, body, send, redis, redis_key, fingerprint, token
+        )
+
+    async def _claim_or_wait(
+        self, redis: Redis, redis_key: str, fingerprint: str, token: str
+    ) -> dict[str, Any] | None:
+        """Claim the key (None) or return the original request's response.
+
+        Polls while the original is in flight, backing off up to 250ms, and
+        claims the key itself if the original gave up on it.
+        """
+        pending = orjson.dumps(
+            {"state": STATE_PENDING, "fingerprint": fingerprint, "token": token}
+        )
+        lock_ms = int(settings.IDEMPOTENCY_LOCK_SECONDS * 1000)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.02
+        while True:
+            if await redis.set(redis_key, pending, nx=True, px=lock_ms):
+                return None
+            raw = await redis.get(redis_key)
+            if raw is None:
+                # Released between the two calls; try to claim it again
+                continue
+            record = orjson.loads(raw)
+            if record["fingerprint"] != fingerprint:
+                raise IdempotencyKeyReused()
+            if record["state"] == STATE_DONE:
+                return record
+            if time.monotonic() >= deadline:
+                raise IdempotentRequestInProgress()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+    async def _run_and_store(
+        self,
+        scope: Scope,
+        body: bytes,
+        send: Send,
+        redis: Redis,
+        redis_key: str,
+        fingerprint: str,
+        token: str,
+    ) -> None:
+        status = 500
+        headers: list[tuple[bytes, bytes]] = []
+        chunks: list[bytes] = []
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        keeper = asyncio.create_task(self._keep_claim(redis, redis_key, token))
+        try:
+            await self.app(scope, self._replay_body(body), send_wrapper)
+        except BaseException:
+            await self._release(redis, redis_key, token)
+            raise
+        finally:
+            keeper.cancel()
+        if status >= 500:
+            await self._release(redis, redis_key, token)
+            return
+
+        record = {
+            "state": STATE_DONE,
+            "fingerprint": fingerprint,
+            "status": status,
+            "headers": [
+                [base64.b64encode(k).decode(), base64.b64encode(v).decode()]
+                for k, v in headers
+            ],
+            "body": base64.b64encode(b"".join(chunks)).decode(),
+        }
+        store = redis_client.get_script(STORE_IF_CLAIMED_LUA)
+        try:
+            stored = await store(
+                keys=[redis_key],
+                args=[token, orjson.dumps(record), settings.IDEMPOTENCY_TTL_SECONDS],
+            )
+        except Exception:
+            logger.exception("Failed to store idempotent response")
+            return
+        if not stored:
+            logger.warning("Idempotency claim on %s lost before storing", redis_key)
+
+    @staticmethod
+    async def _keep_claim(redis: Redis, redis_key: str, token: str) -> None:
+        """Renew the claim until cancelled, so a slow request keeps its key."""
+        lock_ms = int(settings.IDEMPOTENCY_LOCK_SECONDS * 1000)
+        renew = redis_client.get_script(RENEW_IF_CLAIMED_LUA)
+        while True:
+            await asyncio.sleep(settings.IDEMPOTENCY_LOCK_SECONDS / 3)
+            try:
+                if not await renew(keys=[redis_key], args=[token, lock_ms]):
+                    logger.warning("Idempotency claim on %s lost", redis_key)
+                    return
+            except Exception:
+                logger.exception("Failed to renew idempotency claim")
+
+    @staticmethod
+    async def _release(redis: Redis, redis_key: str, token: str) -> None:
+        release = redis_client.get_script(RELEASE_IF_CLAIMED_LUA)
+        try:
+            await release(keys=[redis_key], args=[token])
+        except Exception:
+            logger.exception("Failed to release idempotency key")
+
+    @staticmethod
+    async def _replay(record: dict[str, Any], send: Send) -> None:
+        headers = [
+            (base64.b64decode(k), base64.b64decode(v)) for k, v in record["headers"]
+        ]
+        await send(
+            {
+                "type": "http.response.start",
+                "status": record["status"],
+                "headers": [*headers, REPLAYED_HEADER],
+            }
+        )
+        await send(
+            {"type": "http.response.body", "body": base64.b64decode(record["body"])}
+        )
+
+    @staticmethod
+    def _replay_body(body: bytes) -> Receive:
+        """A receive callable that hands the buffered body to the endpoint."""
+        sent = False
+
+        async def receive() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Nothing more will arrive; behave like a client that stays open
+            await asyncio.Event().wait()
+            return {"type": "http.disconnect"}
+
+        return receive
+
+    @staticmethod
+    async def _error(
+        exc: AppException, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        response = JSONResponse(status_code=exc.status_code, content=exc.to_dict())
+        await response(scope, receive, send)
@@ -0,0 +1,62 @@
+import logging
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.utils import sql_profiler
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfilerMiddleware:
+    """Counts the SQL statements and DB time of each request.
+
+    Requests over their route's query budget are logged, or fail with
+    ``QueryBudgetExceeded`` when SQL_QUERY_BUDGET_STRICT is set (as in tests).
+    ``route_budgets`` maps route templates to their own budget. In debug mode
+    the counts are returned in X-DB-Query-Count and X-DB-Query-Time-Ms.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        route_budgets: dict[str, int] | None = None,
+    ):
+        self.app = app
+        self.route_budgets = route_budgets or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = sql_profiler.start_request()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self._check_budget(scope, stats)
+                if settings.DEBUG:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-query-count", str(stats.count).encode()),
+                        (
+                            b"x-db-query-time-ms",
+                            f"{stats.seconds * 1000:.2f}".encode(),
+                        ),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _check_budget(self, scope: Scope, stats: sql_profiler.QueryStats) -> None:
+        route = getattr(scope.get("route"), "path", scope["path"])
+        budget = self.route_budgets.get(route, settings.SQL_QUERY_BUDGET)
+        if stats.count <= budget:
+            return
+        message = (
+            f"{scope['method']} {route} issued {stats.count} queries "
+            f"(budget {budget})"
+        )
+        if settings.SQL_QUERY_BUDGET_STRICT:
+            raise sql_profiler.QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,163 @@
+import logging
+import math
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.services import auth_service
+from app.utils import redis_client
+from app.utils.exceptions import AppException, RateLimitExceeded
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_PREFIX = "rl:"
+
+# Sliding-window counter over any number of (current, previous) window key
+# pairs. ARGV: period, weight of the previous window, then one limit per key
+# pair. Counts only if every pair is under its limit. Returns {1} when
+# allowed, or {0, pair index, current, previous}.
+SLIDING_WINDOW_LUA = """
+local period = tonumber(ARGV[1])
+local weight = tonumber(ARGV[2])
+for i = 1, #KEYS / 2 do
+    local limit = tonumber(ARGV[i + 2])
+    local current = tonumber(redis.call('GET', KEYS[i * 2 - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+    if previous * weight + current + 1 > limit then
+        return {0, i, current, previous}
+    end
+end
+for i = 1, #KEYS / 2 do
+    if redis.call('INCR', KEYS[i * 2 - 1]) == 1 then
+        redis.call('EXPIRE', KEYS[i * 2 - 1], period * 2)
+    end
+end
+return {1}
+"""
+
+
+def _retry_after(
+    limit: int, period: int, elapsed: float, current: int, previous: int
+) -> float:
+    """Seconds until the weighted count leaves room for one more request."""
+    if current + 1 > limit or previous == 0:
+        return period - elapsed
+    # Solve previous * (1 - t / period) + current + 1 <= limit for t
+    threshold = period * (1 - (limit - 1 - current) / previous)
+    return max(threshold - elapsed, 0.0)
+
+
+class RateLimitMiddleware:
+    """Per-user and per-IP sliding-window limits, enforced before routing.
+
+    Both limits are checked and counted with one Redis round trip. Clients
+    Redis has already rejected are remembered locally until their window
+    frees up, so they are turned away without calling Redis again. Paths in
+    ``route_limits`` use their own (requests, period) instead of the
+    defaults. If Redis is unavailable, requests are let through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        route_limits: dict[str, tuple[int, int]] | None = None,
+        exempt_paths: tuple[str, ...] = ("/health",),
+    ):
+        self.app = app
+        self.route_limits = route_limits or {}
+        self.exempt_paths = exempt_paths
+        self._blocked: TTLCache[str, float] = TTLCache(
+            maxsize=settings.RATE_LIMIT_LOCAL_MAXSIZE, ttl=0
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = await self._check(scope)
+        if retry_after is None:
+            await self.app(scope, receive, send)
+            return
+
+        exc = RateLimitExceeded()
+        response = JSONResponse(
+            status_code=exc.status_code,
+            content=exc.to_dict(),
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        await response(scope, receive, send)
+
+    def _limits(self, scope: Scope) -> tuple[int, list[tuple[str, int]]]:
+        """Return the window period and the (identity, limit) pairs to enforce."""
+        path = scope["path"]
+        route_limit = self.route_limits.get(path)
+        if route_limit is not None:
+            bucket = path
+            user_limit, period = route_limit
+            ip_limit = user_limit
+        else:
+            bucket = "global"
+            user_limit = settings.RATE_LIMIT_REQUESTS
+            ip_limit = settings.RATE_LIMIT_IP_REQUESTS
+            period = settings.RATE_LIMIT_PERIOD
+
+        limits = []
+        user_id = user_id_from_scope(scope)
+        if user_id is not None:
+            limits.append((f"{bucket}:user:{user_id}", user_limit))
+        client = scope.get("client")
+        if client is not None:
+            limits.append((f"{bucket}:ip:{client[0]}", ip_limit))
+        return period, limits
+
+    async def _check(self, scope: Scope) -> float | None:
+        """Return None if allowed, otherwise seconds until the client may retry."""
+        period, limits = self._limits(scope)
+        now = time.time()
+        for identity, _ in limits:
+            blocked_until = self._blocked.get(identity)
+            if blocked_until is not None:
+                return blocked_until - now
+        if not limits or redis_client.redis_client is None:
+            return None
+
+        window = int(now // period)
+        elapsed = now - window * period
+        keys: list[str] = []
+        args: list[float] = [period, 1 - elapsed / period]
+        for identity, limit in limits:
+            keys.append(f"{RATE_LIMIT_PREFIX}{identity}:{window}")
+            keys.append(f"{RATE_LIMIT_PREFIX}{identity}:{window - 1}")
+            args.append(limit)
+
+        try:
+            script = redis_client.get_script(SLIDING_WINDOW_LUA)
+            result = await script(keys=keys, args=args)
+        except Exception:
+            logger.exception("Rate limit check failed, allowing request")
+            return None
+        if result[0] == 1:
+            return None
+
+        identity, limit = limits[result[1] - 1]
+        retry_after = _retry_after(limit, period, elapsed, result[2], result[3])
+        self._blocked.set(identity, now + retry_after, ttl=retry_after)
+        return retry_after
+
+
+def user_id_from_scope(scope: Scope) -> str | None:
+    """The user id in a valid bearer token, without touching the database."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                return str(auth_service.decode_access_token(token))
+            except AppException:
+                return None
+    return None
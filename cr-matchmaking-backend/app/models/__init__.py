@@ -1,6 +1,6 @@
 from app.models.base import Base
 from app.models.match import Match
 from app.models.transaction import Transaction
-from app.models.user import User, UserBalance
+from app.models.user import User, UserBalance, UserStats
 
-__all__ = ["Base", "User", "UserBalance", "Match", "Transaction"]
+__all__ = ["Base", "User", "UserBalance", "UserStats", "Match", "Transaction"]
@@ -30,19 +30,21 @@ class Match(Base):
     player1_tag: Mapped[str] = mapped_column(String(20), nullable=False)
     player2_tag: Mapped[str] = mapped_column(String(20), nullable=False)
     bet_amount: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
-    status: Mapped[str] = mapped_column(String(20), nullable=False, default=MATCH_STATUS_ACTIVE)
+    status: Mapped[str] = mapped_column(
+        String(20), nullable=False, default=MATCH_STATUS_ACTIVE
+    )
     winner_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=True
     )
     battle_time: Mapped[datetime | None] = mapped_column(nullable=True)
+    # The battle that settled the match; unique, so one battle pays out once
+    battle_fingerprint: Mapped[str | None] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         server_default=func.now(), nullable=False
     )
     expires_at: Mapped[datetime] = mapped_column(nullable=False)
     completed_at: Mapped[datetime | None] = mapped_column(nullable=True)
-    cancellation_reason: Mapped[str | None] = mapped_column(
-        String(100), nullable=True
-    )
+    cancellation_reason: Mapped[str | None] = mapped_column(String(100), nullable=True)
 
     player1: Mapped["User"] = relationship(foreign_keys=[player1_id])
     player2: Mapped["User"] = relationship(foreign_keys=[player2_id])
@@ -50,7 +52,10 @@ class Match(Base):
 
     __table_args__ = (
         Index("idx_matches_status", "status"),
-        Index("idx_matches_players", "player1_id", "player2_id"),
+        # One per seat: match history merges both in keyset order
+        Index("idx_matches_player1_created", "player1_id", "created_at", "match_id"),
+        Index("idx_matches_player2_created", "player2_id", "created_at", "match_id"),
+        Index("uq_matches_battle_fingerprint", "battle_fingerprint", unique=True),
         Index(
             "idx_matches_expires_active",
             "expires_at",
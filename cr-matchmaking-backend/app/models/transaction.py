@@ -37,18 +37,12 @@ class Transaction(Base):
     balance_before: Mapped[Decimal | None] = mapped_column(
         Numeric(10, 2), nullable=True
     )
-    balance_after: Mapped[Decimal | None] = mapped_column(
-        Numeric(10, 2), nullable=True
-    )
+    balance_after: Mapped[Decimal | None] = mapped_column(Numeric(10, 2), nullable=True)
     match_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True), ForeignKey("matches.match_id"), nullable=True
     )
-    stripe_payment_id: Mapped[str | None] = mapped_column(
-        String(100), nullable=True
-    )
-    status: Mapped[str] = mapped_column(
-        String(20), default=TX_STATUS_COMPLETED
-    )
+    stripe_payment_id: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    status: Mapped[str] = mapped_column(String(20), default=TX_STATUS_COMPLETED)
     metadata_: Mapped[dict[str, Any] | None] = mapped_column(
         "metadata", JSONB, nullable=True
     )
@@ -60,7 +54,10 @@ class Transaction(Base):
     match: Mapped["Match | None"] = relationship(foreign_keys=[match_id])
 
     __table_args__ = (
-        Index("idx_transactions_user", "user_id"),
+        # Serves per-user history in keyset order (see balance_service)
+        Index(
+            "idx_transactions_user_created", "user_id", "created_at", "transaction_id"
+        ),
         Index("idx_transactions_match", "match_id"),
         Index("idx_transactions_created", "created_at"),
     )
@@ -67,3 +67,25 @@ class UserBalance(Base):
     user: Mapped["User"] = relationship(back_populates="balance")
 
     __table_args__ = (Index("idx_balances_user", "user_id"),)
+
+
+class UserStats(Base):
+    """Match counters per user, maintained by settlement in the same transaction."""
+
+    __tablename__ = "user_stats"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.user_id"),
+        primary_key=True,
+    )
+    total_matches: Mapped[int] = mapped_column(nullable=False, default=0)
+    wins: Mapped[int] = mapped_column(nullable=False, default=0)
+    losses: Mapped[int] = mapped_column(nullable=False, default=0)
+    draws: Mapped[int] = mapped_column(nullable=False, default=0)
+    # Every match the user has been in, whatever its status; maintained at
+    # match creation so match history never needs COUNT(*)
+    match_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        server_default=func.now(), onupdate=func.now(), nullable=False
+    )
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
@@ -6,6 +7,7 @@ from app.dependencies import get_current_user
 from app.models.user import User
 from app.schemas.auth import AuthResponse, LoginRequest, RegisterRequest, TokenResponse
 from app.services import auth_service
+from app.utils.redis_client import get_redis
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -22,8 +24,9 @@ async def register(
 async def login(
     request: LoginRequest,
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
 ) -> AuthResponse:
-    return await auth_service.login(db, request)
+    return await auth_service.login(db, redis, request)
 
 
 @router.post("/refresh", response_model=TokenResponse)
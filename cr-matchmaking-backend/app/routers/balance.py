@@ -0,0 +1,46 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.dependencies import get_current_user, get_read_db
+from app.models.user import User
+from app.schemas.balance import TransactionListResponse
+from app.services import balance_service
+from app.utils.serialization import orm_response
+
+router = APIRouter(prefix="/api/balance", tags=["balance"])
+
+_EXPORT_MEDIA_TYPES = {
+    balance_service.EXPORT_FORMAT_NDJSON: "application/x-ndjson",
+    balance_service.EXPORT_FORMAT_CSV: "text/csv",
+}
+
+
+@router.get("/transactions", response_model=TransactionListResponse)
+async def list_transactions(
+    limit: int = Query(
+        settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE
+    ),
+    cursor: str | None = None,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    page = await balance_service.list_transactions(db, user.user_id, limit, cursor)
+    return orm_response(TransactionListResponse, page)
+
+
+@router.get("/transactions/export")
+async def export_transactions(
+    fmt: Literal["ndjson", "csv"] = Query(
+        balance_service.EXPORT_FORMAT_NDJSON, alias="format"
+    ),
+    user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    return StreamingResponse(
+        balance_service.export_transactions(user.user_id, fmt),
+        media_type=_EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{fmt}"'},
+    )
@@ -0,0 +1,74 @@
+import asyncio
+from collections.abc import AsyncGenerator
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.config import settings
+from app.dependencies import bearer_scheme
+from app.services import auth_service, event_service
+from app.utils.exceptions import AppException
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+@router.websocket("/ws")
+async def events_websocket(websocket: WebSocket, token: str = Query()) -> None:
+    # Browsers cannot set headers on a WebSocket handshake, so the token is a
+    # query parameter here.
+    try:
+        user_id = auth_service.decode_access_token(token)
+    except AppException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    async with event_service.subscribe(user_id) as queue:
+
+        async def forward() -> None:
+            while True:
+                await websocket.send_text(await queue.get())
+
+        sender = asyncio.create_task(forward())
+        try:
+            # Client messages are ignored; this only waits for the disconnect
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+
+
+@router.get("/stream")
+async def events_stream(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+) -> StreamingResponse:
+    """Server-Sent Events fallback for clients that cannot use the WebSocket."""
+    user_id = auth_service.decode_access_token(credentials.credentials)
+
+    async def stream() -> AsyncGenerator[str, None]:
+        async with event_service.subscribe(user_id) as queue:
+            while True:
+                try:
+                    payload = await asyncio.wait_for(
+                        queue.get(), settings.EVENT_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {payload}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.dependencies import get_current_user, get_read_db
+from app.models.user import User
+from app.schemas.match import MatchListResponse
+from app.services import match_service
+from app.utils.serialization import orm_response
+
+router = APIRouter(prefix="/api/matches", tags=["matches"])
+
+
+@router.get("", response_model=MatchListResponse)
+async def list_matches(
+    limit: int = Query(
+        settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE
+    ),
+    cursor: str | None = None,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    page = await match_service.list_matches(db, user.user_id, limit, cursor)
+    return orm_response(MatchListResponse, page)
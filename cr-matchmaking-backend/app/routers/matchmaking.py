@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.dependencies import require_verified_cr_account
+from app.models.user import User
+from app.schemas.matchmaking import (
+    JoinQueueRequest,
+    JoinQueueResponse,
+    QueueStatusResponse,
+)
+from app.services import matchmaking_service
+from app.utils.redis_client import get_redis
+
+router = APIRouter(prefix="/api/matchmaking", tags=["matchmaking"])
+
+
+@router.post("/queue", response_model=JoinQueueResponse, status_code=201)
+async def join_queue(
+    request: JoinQueueRequest,
+    user: User = Depends(require_verified_cr_account),
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+) -> JoinQueueResponse:
+    return await matchmaking_service.join_queue(db, redis, user, request)
+
+
+@router.get("/queue/status", response_model=QueueStatusResponse)
+async def queue_status(
+    user: User = Depends(require_verified_cr_account),
+    redis: Redis = Depends(get_redis),
+) -> QueueStatusResponse:
+    return await matchmaking_service.get_queue_status(redis, user)
+
+
+@router.delete("/queue", status_code=204)
+async def leave_queue(
+    user: User = Depends(require_verified_cr_account),
+    redis: Redis = Depends(get_redis),
+) -> None:
+    await matchmaking_service.leave_queue(redis, user)
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, get_current_user_row, get_read_db
 from app.models.user import User
 from app.schemas.user import (
     LinkCRAccountRequest,
@@ -14,39 +14,53 @@ from app.schemas.user import (
     VerifyCRAccountRequest,
     VerifyCRAccountResponse,
 )
-from app.services import user_service
+from app.services import stats_service, user_service
+from app.utils import etag
 from app.utils.redis_client import get_redis
+from app.utils.serialization import orm_response
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(user: User = Depends(get_current_user)) -> UserResponse:
-    return UserResponse.model_validate(user)
+async def get_me(request: Request, user: User = Depends(get_current_user)) -> Response:
+    # Every change to the row moves updated_at, and the cached user has it
+    tag = etag.weak_etag("u", user.updated_at.timestamp())
+    if etag.matches(request, tag):
+        return etag.not_modified(tag)
+    return orm_response(UserResponse, user, headers=etag.headers(tag))
 
 
 @router.patch("/me", response_model=UserResponse)
 async def update_me(
     update: UserUpdate,
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_row),
     db: AsyncSession = Depends(get_db),
-) -> UserResponse:
-    updated = await user_service.update_user(db, user, update)
-    return UserResponse.model_validate(updated)
+    redis: Redis = Depends(get_redis),
+) -> Response:
+    updated = await user_service.update_user(db, redis, user, update)
+    return orm_response(UserResponse, updated)
 
 
 @router.get("/me/stats", response_model=UserStatsResponse)
 async def get_my_stats(
+    request: Request,
     user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
-) -> UserStatsResponse:
-    return await user_service.get_stats(db, user.user_id)
+    db: AsyncSession = Depends(get_read_db),
+    redis: Redis = Depends(get_redis),
+) -> Response:
+    # Checked before the query, so a 304 never touches the database
+    tag = etag.weak_etag("s", await stats_service.get_version(redis, user.user_id))
+    if etag.matches(request, tag):
+        return etag.not_modified(tag)
+    stats = await user_service.get_stats(db, user.user_id)
+    return orm_response(UserStatsResponse, stats, headers=etag.headers(tag))
 
 
 @router.post("/me/link-cr", response_model=LinkCRAccountResponse)
 async def link_cr(
     request: LinkCRAccountRequest,
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_row),
     db: AsyncSession = Depends(get_db),
     redis: Redis = Depends(get_redis),
 ) -> LinkCRAccountResponse:
@@ -56,7 +70,7 @@ async def link_cr(
 @router.post("/me/verify-cr", response_model=VerifyCRAccountResponse)
 async def verify_cr(
     request: VerifyCRAccountRequest,
-    user: User = Depends(get_current_user),
+    user: User = Depends(get_current_user_row),
     db: AsyncSession = Depends(get_db),
     redis: Redis = Depends(get_redis),
 ) -> VerifyCRAccountResponse:
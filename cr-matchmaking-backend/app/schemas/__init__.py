@@ -3,6 +3,7 @@ from app.schemas.balance import (
     BalanceResponse,
     DepositRequest,
     DepositResponse,
+    TransactionListResponse,
     TransactionResponse,
     WithdrawRequest,
     WithdrawResponse,
@@ -17,6 +18,7 @@ from app.schemas.matchmaking import (
     JoinQueueRequest,
     JoinQueueResponse,
     MatchFoundEvent,
+    MatchResultEvent,
     QueueStatusResponse,
 )
 from app.schemas.user import (
@@ -45,6 +47,7 @@ __all__ = [
     "WithdrawRequest",
     "WithdrawResponse",
     "TransactionResponse",
+    "TransactionListResponse",
     "MatchResponse",
     "MatchDetailResponse",
     "MatchListResponse",
@@ -53,4 +56,5 @@ __all__ = [
     "JoinQueueResponse",
     "QueueStatusResponse",
     "MatchFoundEvent",
+    "MatchResultEvent",
 ]
@@ -49,3 +49,9 @@ class TransactionResponse(BaseModel):
     created_at: datetime
 
     model_config = {"from_attributes": True}
+
+
+class TransactionListResponse(BaseModel):
+    transactions: list[TransactionResponse]
+    # Pass back as ?cursor= for the next page; None on the last page
+    next_cursor: str | None = None
@@ -44,6 +44,8 @@ class MatchDetailResponse(BaseModel):
 class MatchListResponse(BaseModel):
     matches: list[MatchResponse]
     total: int
+    # Pass back as ?cursor= for the next page; None on the last page
+    next_cursor: str | None = None
 
 
 class DisputeRequest(BaseModel):
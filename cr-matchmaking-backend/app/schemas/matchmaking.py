@@ -28,3 +28,10 @@ class MatchFoundEvent(BaseModel):
     opponent: OpponentInfo
     bet_amount: float
     expires_at: datetime
+
+
+class MatchResultEvent(BaseModel):
+    match_id: uuid.UUID
+    status: str
+    result: str
+    payout: float | None = None
@@ -0,0 +1,30 @@
+"""Recompute user_stats from the matches table.
+
+Usage: poetry run python -m app.scripts.rebuild_user_stats
+
+Run it with settlement paused (battle poller, job workers and the expiry
+sweeper stopped). The rebuild locks user_stats until it commits, so any
+settlement or match creation that runs meanwhile blocks for that long.
+"""
+
+import asyncio
+
+# Import all models so relationships resolve
+import app.models  # noqa: F401
+from app.database import async_session, engine
+from app.services import stats_service
+from app.utils.redis_client import close_redis, init_redis
+
+
+async def main() -> None:
+    async with async_session() as db:
+        count = await stats_service.rebuild_all(db)
+    # Cached /me/stats responses no longer match the rebuilt counters
+    await stats_service.reset_versions(await init_redis())
+    await close_redis()
+    await engine.dispose()
+    print(f"Rebuilt stats for {count} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,15 @@
+import asyncio
+import hashlib
+import time
 import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import TypeVar
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from redis.asyncio import Redis
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -10,17 +17,74 @@ from app.config import settings
 from app.models.user import User, UserBalance
 from app.schemas.auth import AuthResponse, LoginRequest, RegisterRequest
 from app.schemas.user import UserResponse
+from app.services import user_cache_service
 from app.utils.exceptions import AppException
+from app.utils.metrics import (
+    PASSWORD_HASH_IN_FLIGHT,
+    PASSWORD_HASH_QUEUED,
+    PASSWORD_HASH_REJECTED,
+    PASSWORD_HASH_SECONDS,
+)
+from app.utils.ttl_cache import TTLCache
+
+T = TypeVar("T")
+
+# Pinning min/max to the configured cost makes any hash created with a
+# different cost "need update", so it is rehashed on the next login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt releases the GIL, so a thread pool keeps it off the event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_CONCURRENCY, thread_name_prefix="bcrypt"
+)
+_hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_CONCURRENCY)
+
+# Token digest -> user id for verified tokens, or the error message for bad ones
+_token_cache: TTLCache[bytes, uuid.UUID | str] = TTLCache(
+    maxsize=settings.JWT_CACHE_MAXSIZE, ttl=settings.JWT_CACHE_NEGATIVE_TTL_SECONDS
+)
+
+
+async def _run_hashing(operation: str, func: Callable[..., T], *args: str) -> T:
+    PASSWORD_HASH_QUEUED.inc()
+    try:
+        await asyncio.wait_for(
+            _hash_slots.acquire(), settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        PASSWORD_HASH_REJECTED.inc()
+        raise AppException(
+            code="SERVER_BUSY",
+            message="Server is busy, please try again",
+            status_code=503,
+        )
+    finally:
+        PASSWORD_HASH_QUEUED.dec()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    PASSWORD_HASH_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        PASSWORD_HASH_SECONDS.labels(operation).observe(time.perf_counter() - started)
+        PASSWORD_HASH_IN_FLIGHT.dec()
+        _hash_slots.release()
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await _run_hashing("hash", pwd_context.hash, password)
 
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+async def verify_password(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """Check a password. Also returns a new hash if the stored one is outdated."""
+    return await _run_hashing("verify", pwd_context.verify_and_update, plain, hashed)
 
 
 def create_access_token(user_id: uuid.UUID) -> str:
@@ -30,22 +94,36 @@ def create_access_token(user_id: uuid.UUID) -> str:
 
 
 def decode_access_token(token: str) -> uuid.UUID:
+    """Verify a token and return its user id.
+
+    Verified tokens are cached by digest until they expire, and bad tokens
+    are remembered briefly, so repeat requests skip the signature check.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(digest)
+    if isinstance(cached, uuid.UUID):
+        return cached
+    if cached is not None:
+        raise AppException(code="INVALID_TOKEN", message=cached, status_code=401)
+
     try:
         payload = jwt.decode(
             token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
         )
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise AppException(
-                code="INVALID_TOKEN", message="Invalid token", status_code=401
-            )
-        return uuid.UUID(user_id)
-    except JWTError:
-        raise AppException(
-            code="INVALID_TOKEN",
-            message="Invalid or expired token",
-            status_code=401,
+        user_id = uuid.UUID(payload["sub"])
+        # A signed token without exp is still not one this service issued
+        expires_at = float(payload["exp"])
+    except (JWTError, KeyError, TypeError, ValueError) as exc:
+        message = (
+            "Invalid or expired token" if isinstance(exc, JWTError) else "Invalid token"
         )
+        _token_cache.set(digest, message, ttl=settings.JWT_CACHE_NEGATIVE_TTL_SECONDS)
+        raise AppException(code="INVALID_TOKEN", message=message, status_code=401)
+
+    ttl = expires_at - time.time()
+    if ttl > 0:
+        _token_cache.set(digest, user_id, ttl=ttl)
+    return user_id
 
 
 async def register(db: AsyncSession, request: RegisterRequest) -> AuthResponse:
@@ -67,7 +145,7 @@ async def register(db: AsyncSession, request: RegisterRequest) -> AuthResponse:
 
     user = User(
         email=request.email,
-        password_hash=hash_password(request.password),
+        password_hash=await hash_password(request.password),
         username=request.username,
     )
     db.add(user)
@@ -82,16 +160,25 @@ async def register(db: AsyncSession, request: RegisterRequest) -> AuthResponse:
     return AuthResponse(token=token, user=UserResponse.model_validate(user))
 
 
-async def login(db: AsyncSession, request: LoginRequest) -> AuthResponse:
+async def login(db: AsyncSession, redis: Redis, request: LoginRequest) -> AuthResponse:
     result = await db.execute(select(User).where(User.email == request.email))
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(request.password, user.password_hash):
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await verify_password(request.password, user.password_hash)
+    if not user or not valid:
         raise AppException(
             code="INVALID_CREDENTIALS",
             message="Invalid email or password",
             status_code=401,
         )
 
+    if new_hash is not None:
+        # Stored hash was made with a different bcrypt cost
+        user.password_hash = new_hash
+        await db.commit()
+        await user_cache_service.invalidate_user(redis, user.user_id)
+
     token = create_access_token(user.user_id)
     return AuthResponse(token=token, user=UserResponse.model_validate(user))
@@ -0,0 +1,101 @@
+import csv
+import io
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any, NamedTuple
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.config import settings
+from app.models.transaction import Transaction
+from app.schemas.balance import TransactionResponse
+from app.utils import pagination, serialization
+
+EXPORT_FORMAT_NDJSON = "ndjson"
+EXPORT_FORMAT_CSV = "csv"
+
+_TX_COLUMNS = [getattr(Transaction, name) for name in TransactionResponse.model_fields]
+
+
+class TransactionPage(NamedTuple):
+    transactions: list[Any]
+    next_cursor: str | None
+
+
+def _history_query(user_id: uuid.UUID) -> Select:
+    # Newest first; transaction_id breaks ties between rows of one DB
+    # transaction, which share created_at
+    return (
+        select(*_TX_COLUMNS)
+        .where(Transaction.user_id == user_id)
+        .order_by(Transaction.created_at.desc(), Transaction.transaction_id.desc())
+    )
+
+
+async def list_transactions(
+    db: AsyncSession, user_id: uuid.UUID, limit: int, cursor: str | None = None
+) -> TransactionPage:
+    """One page of a user's ledger, newest first.
+
+    Keyset pagination on (created_at, transaction_id) walks
+    idx_transactions_user_created, so every page costs the same however
+    deep it is.
+    """
+    query = _history_query(user_id).limit(limit + 1)
+    if cursor is not None:
+        created_at, transaction_id = pagination.decode_cursor(cursor)
+        query = query.where(
+            tuple_(Transaction.created_at, Transaction.transaction_id)
+            < tuple_(created_at, transaction_id)
+        )
+
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pagination.encode_cursor(
+            rows[-1].created_at, rows[-1].transaction_id
+        )
+    return TransactionPage(rows, next_cursor)
+
+
+async def export_transactions(user_id: uuid.UUID, fmt: str) -> AsyncIterator[bytes]:
+    """Stream a user's whole ledger as NDJSON or CSV.
+
+    Rows come through a server-side cursor EXPORT_BATCH_SIZE at a time, so
+    memory stays flat however long the history is. The session is opened
+    here rather than taken from a dependency because the body is sent after
+    the handler returns.
+    """
+    session_factory = database.replica_session or database.async_session
+    serialize = serialization.get_serializer(TransactionResponse)
+    fields = list(TransactionResponse.model_fields)
+
+    async with session_factory() as db:
+        result = await db.stream(
+            _history_query(user_id).execution_options(
+                yield_per=settings.EXPORT_BATCH_SIZE
+            )
+        )
+        if fmt == EXPORT_FORMAT_CSV:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+
+            def drain() -> bytes:
+                data = buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                return data
+
+            writer.writerow(fields)
+            yield drain()
+            async for partition in result.partitions():
+                writer.writerows(partition)
+                yield drain()
+        else:
+            async for partition in result.partitions():
+                yield b"".join(
+                    serialization.dumps(serialize(row)) + b"\n" for row in partition
+                )
@@ -0,0 +1,295 @@
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Collection, Container, Iterable
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.match import MATCH_STATUS_ACTIVE, Match
+from app.services import battlelog_service, job_service, settlement_service
+from app.services.battlelog_service import BattleSummary
+from app.services.settlement_service import MatchDecision
+from app.utils import lease, redis_client
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = "battle_poller:leader"
+JOB_SETTLE_BATTLES = "settle_battles"
+# Set while a match's settlement job is queued, so later cycles don't
+# queue it again
+QUEUED_PREFIX = "battle_poller:queued:"
+
+
+class ActiveMatch(NamedTuple):
+    match_id: uuid.UUID
+    player1_id: uuid.UUID
+    player2_id: uuid.UUID
+    player1_tag: str
+    player2_tag: str
+    created_at: datetime
+    expires_at: datetime
+
+
+class MatchIndex:
+    """Active matches keyed by their unordered pair of player tags.
+
+    Lets every battle fetched in a cycle be checked against all matches
+    between the same two players with one dict lookup.
+    """
+
+    def __init__(self, matches: Iterable[ActiveMatch]):
+        self._by_pair: dict[tuple[str, str], list[ActiveMatch]] = defaultdict(list)
+        for match in matches:
+            self._by_pair[self._key(match.player1_tag, match.player2_tag)].append(match)
+        for candidates in self._by_pair.values():
+            candidates.sort(key=lambda m: m.created_at)
+
+    @staticmethod
+    def _key(tag_a: str, tag_b: str) -> tuple[str, str]:
+        return (tag_a, tag_b) if tag_a <= tag_b else (tag_b, tag_a)
+
+    def find(
+        self, battle: BattleSummary, taken: Container[uuid.UUID]
+    ) -> ActiveMatch | None:
+        """The earliest match not in ``taken`` whose window holds the battle."""
+        for match in self._by_pair.get(self._key(battle.tag, battle.opponent_tag), ()):
+            if (
+                match.match_id not in taken
+                and match.created_at <= battle.battle_time <= match.expires_at
+            ):
+                return match
+        return None
+
+
+def decide(match: ActiveMatch, battle: BattleSummary) -> MatchDecision:
+    if battle.crowns == battle.opponent_crowns:
+        winner_id = None
+    else:
+        won = battle.crowns > battle.opponent_crowns
+        winner_tag = battle.tag if won else battle.opponent_tag
+        winner_id = (
+            match.player1_id if winner_tag == match.player1_tag else match.player2_id
+        )
+    return MatchDecision(
+        match.match_id, winner_id, battle.battle_time, battle.fingerprint
+    )
+
+
+def poll_interval(match: ActiveMatch, now: datetime) -> float:
+    """Seconds between polls of a match; shrinks as it nears expiry."""
+    remaining = (match.expires_at - now).total_seconds()
+    return min(
+        settings.BATTLE_POLL_MAX_INTERVAL_SECONDS,
+        max(
+            settings.BATTLE_POLL_MIN_INTERVAL_SECONDS,
+            remaining * settings.BATTLE_POLL_EXPIRY_FRACTION,
+        ),
+    )
+
+
+async def _load_active(db: AsyncSession) -> list[ActiveMatch]:
+    result = await db.execute(
+        select(
+            Match.match_id,
+            Match.player1_id,
+            Match.player2_id,
+            Match.player1_tag,
+            Match.player2_tag,
+            Match.created_at,
+            Match.expires_at,
+        ).where(Match.status == MATCH_STATUS_ACTIVE)
+    )
+    return [ActiveMatch(*row) for row in result]
+
+
+async def _settled_fingerprints(
+    db: AsyncSession, fingerprints: Collection[str]
+) -> set[str]:
+    """Those of ``fingerprints`` whose battle has already settled a match."""
+    if not fingerprints:
+        return set()
+    result = await db.execute(
+        select(Match.battle_fingerprint).where(
+            Match.battle_fingerprint.in_(fingerprints)
+        )
+    )
+    return set(result.scalars())
+
+
+def _settle_payload(decisions: Iterable[MatchDecision]) -> dict[str, Any]:
+    return {
+        "decisions": [
+            [
+                str(d.match_id),
+                str(d.winner_id) if d.winner_id else None,
+                d.battle_time.isoformat() if d.battle_time else None,
+                d.battle_fingerprint,
+            ]
+            for d in decisions
+        ]
+    }
+
+
+def _settle_job_id(decisions: Iterable[MatchDecision]) -> str:
+    """Same decisions, same job id, so a completed repeat is skipped."""
+    digest = hashlib.sha256()
+    for d in sorted(decisions):
+        digest.update(f"{d.match_id}:{d.battle_fingerprint};".encode())
+    return f"{JOB_SETTLE_BATTLES}:{digest.hexdigest()}"
+
+
+async def _mark_queued(
+    redis: Redis, decisions: list[MatchDecision]
+) -> list[MatchDecision]:
+    """Mark decisions' matches as queued; returns those not already queued."""
+    ttl = settings.MATCH_TIMEOUT_MINUTES * 60
+    async with redis.pipeline(transaction=False) as pipe:
+        for d in decisions:
+            pipe.set(f"{QUEUED_PREFIX}{d.match_id}", 1, nx=True, ex=ttl)
+        marked = await pipe.execute()
+    return [d for d, ok in zip(decisions, marked) if ok]
+
+
+async def _clear_queued(redis: Redis, match_ids: Iterable[uuid.UUID]) -> None:
+    keys = [f"{QUEUED_PREFIX}{match_id}" for match_id in match_ids]
+    if keys:
+        await redis.delete(*keys)
+
+
+@job_service.handler(JOB_SETTLE_BATTLES)
+async def settle_battles(redis: Redis, payload: dict[str, Any]) -> None:
+    """Settle matches decided by the poller and notify their players.
+
+    Safe to run twice: settlement only pays matches it moves out of active
+    and battles not yet recorded on a match, so a repeat settles nothing and
+    notifies no one. Once it has run, the matches may be queued again (with
+    a different battle) if they are still active.
+    """
+    decisions = [
+        MatchDecision(
+            uuid.UUID(match_id),
+            uuid.UUID(winner_id) if winner_id else None,
+            datetime.fromisoformat(battle_time) if battle_time else None,
+            fingerprint,
+        )
+        for match_id, winner_id, battle_time, fingerprint in payload["decisions"]
+    ]
+    async with async_session() as db:
+        settled = await settlement_service.settle_in_batches(db, decisions)
+    await settlement_service.notify_settled(redis, settled)
+    await _clear_queued(redis, (d.match_id for d in decisions))
+
+
+class BattlePoller:
+    """Settles active matches from the players' battlelogs.
+
+    Each cycle fetches every distinct tag among the matches that are due
+    exactly once, however many matches the player is in, and checks all of
+    those battles against all active matches through a MatchIndex.
+    """
+
+    def __init__(self) -> None:
+        # match_id -> monotonic time it was last polled
+        self._last_polled: dict[uuid.UUID, float] = {}
+        # Expired matches polled since they expired
+        self._final_polled: set[uuid.UUID] = set()
+
+    def _due(self, matches: list[ActiveMatch]) -> list[ActiveMatch]:
+        """Matches due a poll.
+
+        Besides those whose poll interval has passed, a match that expired
+        since its last poll gets one final poll, so a battle played just
+        before expiry settles within the expiry grace period.
+        """
+        now_mono = time.monotonic()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return [
+            m
+            for m in matches
+            if (m.expires_at <= now and m.match_id not in self._final_polled)
+            or now_mono - self._last_polled.get(m.match_id, float("-inf"))
+            >= poll_interval(m, now)
+        ]
+
+    async def run_cycle(self, redis: Redis) -> list[MatchDecision]:
+        async with async_session() as db:
+            matches = await _load_active(db)
+        active_ids = {m.match_id for m in matches}
+        self._last_polled = {
+            k: v for k, v in self._last_polled.items() if k in active_ids
+        }
+        self._final_polled &= active_ids
+
+        due = self._due(matches)
+        if not due:
+            return []
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        tags = {tag for m in due for tag in (m.player1_tag, m.player2_tag)}
+        battles = await battlelog_service.recent_battles(redis, tags)
+        polled_at = time.monotonic()
+        for match in due:
+            self._last_polled[match.match_id] = polled_at
+            if match.expires_at <= now:
+                self._final_polled.add(match.match_id)
+
+        # Both players' logs hold each battle: keep one copy, oldest first, so
+        # repeat matches between the same pair take battles in order. Battles
+        # that already settled a match are skipped.
+        unique = {b.fingerprint: b for summaries in battles.values() for b in summaries}
+        async with async_session() as db:
+            used = await _settled_fingerprints(db, unique.keys())
+        index = MatchIndex(matches)
+        decisions: dict[uuid.UUID, MatchDecision] = {}
+        for battle in sorted(unique.values()):
+            if battle.fingerprint in used:
+                continue
+            match = index.find(battle, decisions.keys())
+            if match is not None:
+                decisions[match.match_id] = decide(match, battle)
+
+        queued = await _mark_queued(redis, list(decisions.values()))
+        if queued:
+            # Settled by a job worker, so a failed payout is retried rather
+            # than waiting for the battle to be matched again
+            try:
+                await job_service.enqueue(
+                    redis,
+                    JOB_SETTLE_BATTLES,
+                    _settle_payload(queued),
+                    job_id=_settle_job_id(queued),
+                )
+            except Exception:
+                await _clear_queued(redis, (d.match_id for d in queued))
+                raise
+        return queued
+
+
+async def run_poller() -> None:
+    """Background loop verifying match results from CR battlelogs.
+
+    Runs on every worker, but only the holder of a Redis lease polls, so the
+    CR API sees one poller however many workers there are. The lease is
+    renewed every cycle, which keeps per-match poll timing on one worker.
+    """
+    poller = BattlePoller()
+    token = uuid.uuid4().hex
+    interval = settings.BATTLE_POLL_MIN_INTERVAL_SECONDS
+    lease_ms = int(interval * 3 * 1000)
+    while True:
+        redis = redis_client.redis_client
+        if redis is not None:
+            try:
+                if await lease.hold(redis, LEADER_KEY, token, lease_ms):
+                    await poller.run_cycle(redis)
+            except Exception:
+                logger.exception("Battle poll failed")
+        await asyncio.sleep(interval)
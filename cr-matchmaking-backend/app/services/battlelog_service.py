@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+from redis.asyncio import Redis
+
+from app.config import settings
+from app.services import cr_api_service
+
+logger = logging.getLogger(__name__)
+
+CURSOR_PREFIX = "battlelog:cursor:"
+SUMMARIES_PREFIX = "battlelog:summaries:"
+
+BATTLE_TIME_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+
+
+class BattleSummary(NamedTuple):
+    """A 1v1 battle from one player's log, reduced to what settlement needs."""
+
+    # Naive UTC, like the timestamps on matches
+    battle_time: datetime
+    tag: str
+    opponent_tag: str
+    crowns: int
+    opponent_crowns: int
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the battle the same way in both players' logs."""
+        tag_a, tag_b = sorted((self.tag, self.opponent_tag))
+        return f"{self.battle_time:%Y%m%dT%H%M%S}|{tag_a}|{tag_b}"
+
+    def encode(self) -> str:
+        ts = int(self.battle_time.replace(tzinfo=timezone.utc).timestamp())
+        return (
+            f"{ts}|{self.tag}|{self.opponent_tag}|"
+            f"{self.crowns}|{self.opponent_crowns}"
+        )
+
+    @classmethod
+    def decode(cls, raw: str) -> "BattleSummary":
+        ts, tag, opponent_tag, crowns, opponent_crowns = raw.split("|")
+        return cls(
+            datetime.fromtimestamp(int(ts), timezone.utc).replace(tzinfo=None),
+            tag,
+            opponent_tag,
+            int(crowns),
+            int(opponent_crowns),
+        )
+
+
+def parse_battle(battle: dict[str, Any]) -> BattleSummary | None:
+    """Summarise a battlelog entry, or None if it is not a 1v1 battle."""
+    team, opponent = battle.get("team") or [], battle.get("opponent") or []
+    if len(team) != 1 or len(opponent) != 1:
+        return None
+    try:
+        battle_time = datetime.strptime(battle["battleTime"], BATTLE_TIME_FORMAT)
+        return BattleSummary(
+            battle_time,
+            team[0]["tag"],
+            opponent[0]["tag"],
+            int(team[0].get("crowns", 0)),
+            int(opponent[0].get("crowns", 0)),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _raw_fingerprint(battle: dict[str, Any]) -> str:
+    # Cheap identity for cursor comparison, taken before any parsing
+    tags = sorted(
+        side[0].get("tag", "")
+        for side in (battle.get("team"), battle.get("opponent"))
+        if side
+    )
+    return f"{battle.get('battleTime', '')}|{'|'.join(tags)}"
+
+
+def new_entries(log: list[dict[str, Any]], cursor: str | None) -> list[dict]:
+    """Entries of a newest-first battlelog that come after ``cursor``.
+
+    The cursor is the newest entry's battleTime and fingerprint from the
+    previous fetch. battleTime strings sort chronologically, so older
+    entries are recognised without parsing them.
+    """
+    if cursor is None:
+        return log
+    seen_time, seen_fingerprint = cursor.split(" ", 1)
+    fresh = []
+    for battle in log:
+        battle_time = battle.get("battleTime", "")
+        if battle_time < seen_time or _raw_fingerprint(battle) == seen_fingerprint:
+            break
+        fresh.append(battle)
+    return fresh
+
+
+async def _fetch(tag: str, slots: asyncio.Semaphore) -> list[dict] | None:
+    async with slots:
+        try:
+            return await cr_api_service.get_battlelog(tag)
+        except Exception:
+            logger.warning("Battlelog fetch failed for %s", tag, exc_info=True)
+            return None
+
+
+async def recent_battles(
+    redis: Redis, tags: Iterable[str]
+) -> dict[str, list[BattleSummary]]:
+    """Each tag's recent 1v1 battles, newest first, fetching each log once.
+
+    Only battles newer than the tag's cursor are parsed; older ones come
+    from the compact summaries kept for BATTLELOG_SUMMARY_TTL_SECONDS, so
+    verifier CPU tracks new battles rather than log sizes times matches.
+    """
+    tags = list(tags)
+    async with redis.pipeline(transaction=False) as pipe:
+        for tag in tags:
+            pipe.get(f"{CURSOR_PREFIX}{tag}")
+            pipe.lrange(f"{SUMMARIES_PREFIX}{tag}", 0, -1)
+        stored = await pipe.execute()
+
+    slots = asyncio.Semaphore(settings.BATTLE_POLL_CONCURRENCY)
+    logs = await asyncio.gather(*(_fetch(tag, slots) for tag in tags))
+
+    battles: dict[str, list[BattleSummary]] = {}
+    ttl = settings.BATTLELOG_SUMMARY_TTL_SECONDS
+    async with redis.pipeline(transaction=False) as pipe:
+        for i, (tag, log) in enumerate(zip(tags, logs)):
+            cursor, kept = stored[i * 2], stored[i * 2 + 1]
+            key = f"{SUMMARIES_PREFIX}{tag}"
+            if log is not None and cursor is None:
+                # Without a cursor the whole log is parsed again, so the old
+                # summaries would only duplicate it
+                kept = []
+                pipe.delete(key)
+            known = [BattleSummary.decode(raw) for raw in kept]
+            if not log:
+                battles[tag] = known
+                continue
+
+            fresh = [
+                s for s in map(parse_battle, new_entries(log, cursor)) if s is not None
+            ]
+            battles[tag] = (fresh + known)[: settings.BATTLELOG_SUMMARY_MAX]
+
+            head = log[0]
+            pipe.set(
+                f"{CURSOR_PREFIX}{tag}",
+                f"{head.get('battleTime', '')} {_raw_fingerprint(head)}",
+                ex=ttl,
+            )
+            if fresh:
+                # Pushing oldest first leaves the newest at the head
+                pipe.lpush(key, *(s.encode() for s in reversed(fresh)))
+                pipe.ltrim(key, 0, settings.BATTLELOG_SUMMARY_MAX - 1)
+                pipe.expire(key, ttl)
+        await pipe.execute()
+    return battles
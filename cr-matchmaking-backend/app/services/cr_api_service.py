@@ -1,21 +1,133 @@
+import asyncio
+import json
+import time
+from typing import Any
 from urllib.parse import quote
 
 import httpx
 
 from app.config import settings
-from app.utils.exceptions import AppException, InvalidPlayerTag
+from app.utils import cr_quota, metrics, redis_client
+from app.utils.exceptions import AppException, CRAPIRateLimited, InvalidPlayerTag
 
+PLAYER_CACHE_PREFIX = "cr_player:"
+# Cached in place of a profile when the CR API says the tag does not exist
+PLAYER_NOT_FOUND = "__not_found__"
+
+_client: httpx.AsyncClient | None = None
+_inflight: dict[str, asyncio.Future[dict[str, Any]]] = {}
+
+
+async def init_client() -> httpx.AsyncClient:
+    global _client
+    _client = httpx.AsyncClient(
+        base_url=settings.CR_API_URL,
+        headers={"Authorization": f"Bearer {settings.CR_API_KEY}"},
+        http2=True,
+        timeout=settings.CR_API_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=settings.CR_API_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.CR_API_MAX_CONNECTIONS,
+        ),
+    )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    if _client is None:
+        raise RuntimeError("CR API client not initialized")
+    return _client
+
+
+_OUTCOMES = {200: "ok", 403: "forbidden", 404: "not_found", 429: "rate_limited"}
+
+
+async def _request(endpoint: str, path: str) -> httpx.Response:
+    """GET from the CR API, recording latency and outcome under ``endpoint``."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await _get_client().get(path)
+        outcome = _OUTCOMES.get(response.status_code, "error")
+        return response
+    except httpx.TimeoutException:
+        outcome = "timeout"
+        raise
+    finally:
+        metrics.CR_API_REQUEST_SECONDS.labels(endpoint).observe(
+            time.perf_counter() - start
+        )
+        metrics.CR_API_REQUESTS.labels(endpoint, outcome).inc()
+
+
+async def get_player(
+    player_tag: str,
+    use_cache: bool = True,
+    priority: str = cr_quota.PRIORITY_PROFILE,
+) -> dict:
+    """Fetch a player profile from the Clash Royale API.
+
+    Profiles are served from Redis when ``use_cache`` is set, and concurrent
+    lookups of the same tag share a single upstream request. Upstream calls
+    draw from the shared quota at the given priority.
+    """
+    if use_cache:
+        cached = await _get_cached_player(player_tag)
+        if cached == PLAYER_NOT_FOUND:
+            raise InvalidPlayerTag(player_tag)
+        if cached is not None:
+            return json.loads(cached)
+
+    future = _inflight.get(player_tag)
+    if future is None:
+        future = asyncio.ensure_future(_fetch_player(player_tag, priority))
+        _inflight[player_tag] = future
+        future.add_done_callback(lambda _: _inflight.pop(player_tag, None))
+
+    # Shield so one cancelled caller does not cancel the fetch for the others
+    return await asyncio.shield(future)
+
+
+async def _fetch_player(player_tag: str, priority: str) -> dict:
+    await cr_quota.acquire(priority)
 
-async def get_player(player_tag: str) -> dict:
-    """Fetch a player profile from the Clash Royale API."""
     encoded_tag = quote(player_tag, safe="")
-    url = f"{settings.CR_API_URL}/players/{encoded_tag}"
+    response = await _request("player", f"/players/{encoded_tag}")
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url,
-            headers={"Authorization": f"Bearer {settings.CR_API_KEY}"},
+    if response.status_code == 404:
+        await _cache_player(
+            player_tag, PLAYER_NOT_FOUND, settings.CR_PLAYER_NOT_FOUND_TTL_SECONDS
+        )
+        raise InvalidPlayerTag(player_tag)
+    if response.status_code == 403:
+        raise AppException(
+            code="CR_API_ERROR",
+            message="CR API access denied — check API key",
+            status_code=502,
         )
+    if response.status_code == 429:
+        raise CRAPIRateLimited()
+    response.raise_for_status()
+
+    await _cache_player(player_tag, response.text, settings.CR_PLAYER_CACHE_TTL_SECONDS)
+    return response.json()
+
+
+async def get_battlelog(
+    player_tag: str, priority: str = cr_quota.PRIORITY_BATTLE
+) -> list[dict]:
+    """Fetch a player's recent battles, newest first. Never cached."""
+    await cr_quota.acquire(priority)
+
+    encoded_tag = quote(player_tag, safe="")
+    response = await _request("battlelog", f"/players/{encoded_tag}/battlelog")
 
     if response.status_code == 404:
         raise InvalidPlayerTag(player_tag)
@@ -25,5 +137,21 @@ async def get_player(player_tag: str) -> dict:
             message="CR API access denied — check API key",
             status_code=502,
         )
+    if response.status_code == 429:
+        raise CRAPIRateLimited()
     response.raise_for_status()
     return response.json()
+
+
+async def _get_cached_player(player_tag: str) -> str | None:
+    redis = redis_client.redis_client
+    if redis is None:
+        return None
+    return await redis.get(f"{PLAYER_CACHE_PREFIX}{player_tag}")
+
+
+async def _cache_player(player_tag: str, value: str, ttl: int) -> None:
+    redis = redis_client.redis_client
+    if redis is None or ttl <= 0:
+        return
+    await redis.setex(f"{PLAYER_CACHE_PREFIX}{player_tag}", ttl, value)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator, Iterable
+from contextlib import asynccontextmanager
+
+from pydantic import BaseModel
+from redis.asyncio import Redis
+
+from app.config import settings
+from app.utils import redis_client
+
+logger = logging.getLogger(__name__)
+
+# One channel for every user: each worker holds a single subscription and
+# routes messages to its own connections.
+EVENTS_CHANNEL = "events"
+
+EVENT_MATCH_FOUND = "match_found"
+EVENT_QUEUE_STATUS = "queue_status"
+EVENT_MATCH_RESULT = "match_result"
+
+# user_id -> queues of the connections this worker holds for that user
+_connections: dict[str, set[asyncio.Queue[str]]] = defaultdict(set)
+
+
+def _encode(user_id: uuid.UUID, event_type: str, data: BaseModel) -> str:
+    # Prefixed with the user id so the listener can route without parsing JSON
+    payload = json.dumps({"type": event_type, "data": data.model_dump(mode="json")})
+    return f"{user_id} {payload}"
+
+
+async def publish(
+    redis: Redis, user_id: uuid.UUID, event_type: str, data: BaseModel
+) -> None:
+    await redis.publish(EVENTS_CHANNEL, _encode(user_id, event_type, data))
+
+
+async def publish_many(
+    redis: Redis, events: Iterable[tuple[uuid.UUID, str, BaseModel]]
+) -> None:
+    async with redis.pipeline(transaction=False) as pipe:
+        for user_id, event_type, data in events:
+            pipe.publish(EVENTS_CHANNEL, _encode(user_id, event_type, data))
+        await pipe.execute()
+
+
+@asynccontextmanager
+async def subscribe(user_id: uuid.UUID) -> AsyncIterator[asyncio.Queue[str]]:
+    """Register a connection; yields a queue of JSON-encoded events for the user."""
+    key = str(user_id)
+    queue: asyncio.Queue[str] = asyncio.Queue(maxsize=settings.EVENT_QUEUE_MAXSIZE)
+    _connections[key].add(queue)
+    try:
+        yield queue
+    finally:
+        queues = _connections.get(key)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del _connections[key]
+
+
+def _dispatch(message: str) -> None:
+    user_id, _, payload = message.partition(" ")
+    for queue in _connections.get(user_id, ()):
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # A stalled client must not hold up everyone else on this worker
+            logger.warning("Dropping event for slow connection of user %s", user_id)
+
+
+async def run_listener() -> None:
+    """Background loop holding this worker's single Redis subscription."""
+    while True:
+        redis = redis_client.redis_client
+        if redis is None:
+            await asyncio.sleep(1)
+            continue
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(EVENTS_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    _dispatch(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Event subscription failed, reconnecting")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
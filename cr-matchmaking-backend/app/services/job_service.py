@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.config import settings
+from app.utils import metrics, redis_client
+
+logger = logging.getLogger(__name__)
+
+# Jobs ready to run, read through one consumer group
+STREAM_KEY = "jobs:stream"
+GROUP = "workers"
+# Jobs waiting for a retry, scored by when they are due (ms)
+DELAYED_KEY = "jobs:delayed"
+# Jobs that failed JOB_MAX_ATTEMPTS times, with their last error
+DEAD_KEY = "jobs:dead"
+# Set once a job has succeeded, so a redelivered copy is not run again
+DONE_PREFIX = "jobs:done:"
+
+Handler = Callable[[Redis, dict[str, Any]], Awaitable[None]]
+
+_handlers: dict[str, Handler] = {}
+
+# Moves due retries back onto the stream; atomic, so concurrent workers
+# never promote the same job twice
+PROMOTE_DUE_LUA = """
+local due = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(due) do
+    redis.call('XADD', KEYS[2], '*', 'job', job)
+    redis.call('ZREM', KEYS[1], job)
+end
+return #due
+"""
+
+
+class Job(NamedTuple):
+    job_id: str
+    kind: str
+    payload: dict[str, Any]
+    # Failed runs so far
+    attempt: int = 0
+
+    def encode(self) -> str:
+        return orjson.dumps(
+            {
+                "id": self.job_id,
+                "kind": self.kind,
+                "payload": self.payload,
+                "attempt": self.attempt,
+            }
+        ).decode()
+
+    @classmethod
+    def decode(cls, raw: str) -> "Job":
+        data = orjson.loads(raw)
+        return cls(data["id"], data["kind"], data["payload"], int(data["attempt"]))
+
+
+def handler(kind: str) -> Callable[[Handler], Handler]:
+    """Register the coroutine that runs jobs of ``kind``.
+
+    Delivery is at-least-once, so handlers must be safe to run twice for
+    the same job.
+    """
+
+    def register(func: Handler) -> Handler:
+        _handlers[kind] = func
+        return func
+
+    return register
+
+
+async def enqueue(
+    redis: Redis,
+    kind: str,
+    payload: dict[str, Any],
+    *,
+    job_id: str | None = None,
+    delay_seconds: float = 0.0,
+) -> str:
+    """Queue a job and return its id.
+
+    Pass a ``job_id`` derived from the work itself to have a repeat of an
+    already completed job skipped.
+    """
+    job = Job(job_id or uuid.uuid4().hex, kind, payload)
+    if delay_seconds > 0:
+        due_ms = int((time.time() + delay_seconds) * 1000)
+        await redis.zadd(DELAYED_KEY, {job.encode(): due_ms})
+    else:
+        await redis.xadd(STREAM_KEY, {"job": job.encode()})
+    return job.job_id
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter before retry number ``attempt``."""
+    delay = min(
+        settings.JOB_RETRY_MAX_SECONDS,
+        settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1),
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def ensure_group(redis: Redis) -> None:
+    try:
+        await redis.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except ResponseError as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+
+async def report_lag(redis: Redis) -> None:
+    """Publish queue depth and the age of the oldest unfinished job."""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.xlen(STREAM_KEY)
+        pipe.xrange(STREAM_KEY, count=1)
+        pipe.zcard(DELAYED_KEY)
+        pipe.xlen(DEAD_KEY)
+        ready, oldest, delayed, dead = await pipe.execute()
+    age = 0.0
+    if oldest:
+        # Stream ids start with the time the entry was added (ms)
+        added_ms = int(oldest[0][0].split("-", 1)[0])
+        age = max(0.0, time.time() - added_ms / 1000)
+    metrics.JOBS_READY.set(ready)
+    metrics.JOBS_DELAYED.set(delayed)
+    metrics.JOBS_DEAD.set(dead)
+    metrics.JOB_OLDEST_AGE_SECONDS.set(age)
+
+
+class JobWorker:
+    """One consumer in the job group.
+
+    Each step promotes due retries, takes over jobs another consumer left
+    unacknowledged for JOB_VISIBILITY_TIMEOUT_SECONDS, then reads new jobs
+    and runs up to JOB_WORKER_CONCURRENCY of them at once. Entries are
+    deleted once acknowledged, so the stream length is the backlog.
+    Throughput scales by running more workers.
+    """
+
+    def __init__(self, consumer: str) -> None:
+        self.consumer = consumer
+        self._next_report = 0.0
+
+    async def _finish(self, redis: Redis, entry_id: str, job: Job | None) -> None:
+        async with redis.pipeline(transaction=True) as pipe:
+            if job is not None:
+                pipe.set(
+                    f"{DONE_PREFIX}{job.job_id}", 1, ex=settings.JOB_DONE_TTL_SECONDS
+                )
+            pipe.xack(STREAM_KEY, GROUP, entry_id)
+            pipe.xdel(STREAM_KEY, entry_id)
+            await pipe.execute()
+
+    async def _fail(
+        self,
+        redis: Redis,
+        entry_id: str,
+        raw: str,
+        error: str,
+        *,
+        retry: bool = True,
+    ) -> None:
+        """Schedule a retry, or dead-letter the job once attempts run out."""
+        try:
+            job = Job.decode(raw)
+        except (ValueError, KeyError, TypeError):
+            job = None
+        retry = (
+            retry and job is not None and job.attempt + 1 < settings.JOB_MAX_ATTEMPTS
+        )
+        async with redis.pipeline(transaction=True) as pipe:
+            if retry:
+                again = job._replace(attempt=job.attempt + 1)
+                due_ms = int((time.time() + retry_delay(again.attempt)) * 1000)
+                pipe.zadd(DELAYED_KEY, {again.encode(): due_ms})
+                outcome = "retried"
+            else:
+                pipe.xadd(
+                    DEAD_KEY,
+                    {
+                        "job": raw,
+                        "error": error,
+                        "failed_at": datetime.now(timezone.utc).isoformat(),
+                    },
+                    maxlen=settings.JOB_DEAD_LETTER_MAXLEN,
+                    approximate=True,
+                )
+                outcome = "dead"
+            pipe.xack(STREAM_KEY, GROUP, entry_id)
+            pipe.xdel(STREAM_KEY, entry_id)
+            await pipe.execute()
+        kind = job.kind if job is not None else "<invalid>"
+        metrics.JOBS_PROCESSED.labels(kind, outcome).inc()
+
+    async def _run(self, redis: Redis, entry_id: str, raw: str) -> None:
+        try:
+            job = Job.decode(raw)
+        except (ValueError, KeyError, TypeError):
+            await self._fail(redis, entry_id, raw, "malformed job", retry=False)
+            return
+        if await redis.exists(f"{DONE_PREFIX}{job.job_id}"):
+            await self._finish(redis, entry_id, None)
+            metrics.JOBS_PROCESSED.labels(job.kind, "duplicate").inc()
+            return
+        run = _handlers.get(job.kind)
+        if run is None:
+            # Retrying cannot help; keep it for inspection instead
+            error = f"no handler for {job.kind!r}"
+            await self._fail(redis, entry_id, raw, error, retry=False)
+            return
+
+        start = time.perf_counter()
+        try:
+            await run(redis, job.payload)
+        except Exception as exc:
+            logger.warning(
+                "Job %s (%s) failed on attempt %d",
+                job.job_id,
+                job.kind,
+                job.attempt + 1,
+                exc_info=True,
+            )
+            await self._fail(redis, entry_id, raw, repr(exc))
+            return
+        finally:
+            metrics.JOB_SECONDS.labels(job.kind).observe(time.perf_counter() - start)
+        await self._finish(redis, entry_id, job)
+        metrics.JOBS_PROCESSED.labels(job.kind, "ok").inc()
+
+    async def _reclaim(self, redis: Redis) -> None:
+        """Treat jobs idle past the visibility timeout as failed attempts.
+
+        Their consumer most likely died mid-run. Going through the retry
+        path rather than running them here means a job that keeps killing
+        its worker still ends up dead-lettered.
+        """
+        idle_ms = int(settings.JOB_VISIBILITY_TIMEOUT_SECONDS * 1000)
+        reply = await redis.xautoclaim(
+            STREAM_KEY,
+            GROUP,
+            self.consumer,
+            min_idle_time=idle_ms,
+            start_id="0-0",
+            count=settings.JOB_WORKER_CONCURRENCY,
+        )
+        for entry_id, fields in reply[1]:
+            if not fields:
+                # Deleted from the stream while still pending
+                await redis.xack(STREAM_KEY, GROUP, entry_id)
+                continue
+            metrics.JOBS_RECLAIMED.inc()
+            await self._fail(redis, entry_id, fields["job"], "visibility timeout")
+
+    async def step(self, redis: Redis) -> int:
+        promote = redis_client.get_script(PROMOTE_DUE_LUA)
+        await promote(
+            keys=[DELAYED_KEY, STREAM_KEY],
+            args=[int(time.time() * 1000), settings.JOB_WORKER_CONCURRENCY * 10],
+        )
+        await self._reclaim(redis)
+
+        reply = await redis.xreadgroup(
+            GROUP,
+            self.consumer,
+            {STREAM_KEY: ">"},
+            count=settings.JOB_WORKER_CONCURRENCY,
+            block=settings.JOB_BLOCK_MS,
+        )
+        entries = [entry for _, stream in reply or () for entry in stream]
+        await asyncio.gather(
+            *(self._run(redis, entry_id, fields["job"]) for entry_id, fields in entries)
+        )
+
+        now = time.monotonic()
+        if now >= self._next_report:
+            self._next_report = now + settings.JOB_METRICS_INTERVAL_SECONDS
+            await report_lag(redis)
+        return len(entries)
+
+
+def consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+async def run_worker() -> None:
+    """Background loop consuming jobs until cancelled.
+
+    Safe to run on every worker and in any number of `python -m app.worker`
+    processes; each is its own consumer in the group. Jobs in flight when
+    it is cancelled are picked up by another consumer after the visibility
+    timeout.
+    """
+    worker = JobWorker(consumer_name())
+    group_ready = False
+    while True:
+        redis = redis_client.redis_client
+        if redis is None:
+            await asyncio.sleep(1.0)
+            continue
+        try:
+            if not group_ready:
+                await ensure_group(redis)
+                group_ready = True
+            await worker.step(redis)
+        except Exception:
+            logger.exception("Job worker step failed")
+            await asyncio.sleep(1.0)
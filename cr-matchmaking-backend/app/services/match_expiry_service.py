@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from redis.asyncio import Redis
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.match import MATCH_STATUS_ACTIVE, MATCH_STATUS_CANCELLED, Match
+from app.models.transaction import TX_TYPE_REFUND
+from app.schemas.matchmaking import MatchResultEvent
+from app.services import event_service
+from app.services.settlement_service import BalanceMove, apply_balance_moves
+from app.utils import redis_client
+
+logger = logging.getLogger(__name__)
+
+CANCELLATION_REASON_EXPIRED = "expired"
+
+
+class ExpiredMatch(NamedTuple):
+    match_id: uuid.UUID
+    player1_id: uuid.UUID
+    player2_id: uuid.UUID
+    bet_amount: Decimal
+
+
+async def expire_matches(db: AsyncSession, batch_size: int) -> list[ExpiredMatch]:
+    """Cancel up to ``batch_size`` expired active matches and refund both stakes.
+
+    A match is only refunded MATCH_EXPIRY_GRACE_SECONDS after it expires,
+    which leaves the battle poller time to settle a battle played just
+    before expiry. Rows are claimed with FOR UPDATE SKIP LOCKED (served by
+    idx_matches_expires_active), so concurrent sweepers split the work
+    instead of refunding the same match twice.
+    """
+    grace = timedelta(seconds=settings.MATCH_EXPIRY_GRACE_SECONDS)
+    claimed = (
+        select(Match.match_id)
+        .where(
+            Match.status == MATCH_STATUS_ACTIVE,
+            Match.expires_at < func.now() - grace,
+        )
+        .order_by(Match.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(Match)
+        .where(Match.match_id.in_(claimed), Match.status == MATCH_STATUS_ACTIVE)
+        .values(
+            status=MATCH_STATUS_CANCELLED,
+            cancellation_reason=CANCELLATION_REASON_EXPIRED,
+            completed_at=func.now(),
+        )
+        .returning(Match.match_id, Match.player1_id, Match.player2_id, Match.bet_amount)
+        .execution_options(synchronize_session=False)
+    )
+    expired = [ExpiredMatch(*row) for row in result]
+    if not expired:
+        await db.rollback()
+        return []
+
+    zero = Decimal("0.00")
+    await apply_balance_moves(
+        db,
+        [
+            BalanceMove(
+                player_id,
+                match.match_id,
+                TX_TYPE_REFUND,
+                match.bet_amount,
+                match.bet_amount,
+                match.bet_amount,
+                zero,
+            )
+            for match in expired
+            for player_id in (match.player1_id, match.player2_id)
+        ],
+    )
+    await db.commit()
+    return expired
+
+
+async def notify_expired(redis: Redis, expired: list[ExpiredMatch]) -> None:
+    await event_service.publish_many(
+        redis,
+        [
+            (
+                player_id,
+                event_service.EVENT_MATCH_RESULT,
+                MatchResultEvent(
+                    match_id=match.match_id,
+                    status=MATCH_STATUS_CANCELLED,
+                    result=CANCELLATION_REASON_EXPIRED,
+                    payout=float(match.bet_amount),
+                ),
+            )
+            for match in expired
+            for player_id in (match.player1_id, match.player2_id)
+        ],
+    )
+
+
+async def run_sweeper() -> None:
+    """Background loop cancelling expired matches.
+
+    Drains full batches back to back and sleeps once a batch comes back short.
+    Safe to run on every worker and replica at once.
+    """
+    while True:
+        batch_size = settings.MATCH_SWEEPER_BATCH_SIZE
+        try:
+            async with async_session() as db:
+                expired = await expire_matches(db, batch_size)
+            redis = redis_client.redis_client
+            if expired and redis is not None:
+                await notify_expired(redis, expired)
+        except Exception:
+            logger.exception("Expired-match sweep failed")
+            expired = []
+        if len(expired) < batch_size:
+            await asyncio.sleep(settings.MATCH_SWEEPER_INTERVAL_SECONDS)
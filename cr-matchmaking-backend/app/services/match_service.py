@@ -0,0 +1,130 @@
+import uuid
+from typing import NamedTuple
+
+from sqlalchemy import Row, Select, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.match import MATCH_STATUS_COMPLETED, Match
+from app.models.user import User, UserStats
+from app.schemas.match import MatchResponse, OpponentInfo
+from app.services.settlement_service import calculate_payout
+from app.utils import pagination
+
+
+class MatchPage(NamedTuple):
+    matches: list[MatchResponse]
+    total: int
+    next_cursor: str | None
+
+
+def _seat_query(
+    user_id: uuid.UUID, seat: int, limit: int, cursor: str | None
+) -> Select:
+    """One page of the matches a user played from one seat, newest first."""
+    if seat == 1:
+        player, opponent, opponent_tag = (
+            Match.player1_id,
+            Match.player2_id,
+            Match.player2_tag,
+        )
+    else:
+        player, opponent, opponent_tag = (
+            Match.player2_id,
+            Match.player1_id,
+            Match.player1_tag,
+        )
+
+    query = (
+        select(
+            Match.match_id,
+            Match.bet_amount,
+            Match.status,
+            Match.winner_id,
+            Match.created_at,
+            Match.completed_at,
+            opponent.label("opponent_id"),
+            opponent_tag.label("opponent_tag"),
+        )
+        .where(player == user_id)
+        .order_by(Match.created_at.desc(), Match.match_id.desc())
+        .limit(limit)
+    )
+    if cursor is not None:
+        created_at, match_id = pagination.decode_cursor(cursor)
+        query = query.where(
+            tuple_(Match.created_at, Match.match_id) < tuple_(created_at, match_id)
+        )
+    return query
+
+
+def _result(user_id: uuid.UUID, row: Row) -> tuple[str | None, float | None]:
+    if row.status != MATCH_STATUS_COMPLETED:
+        return None, None
+    if row.winner_id is None:
+        return "draw", float(row.bet_amount)
+    if row.winner_id == user_id:
+        return "win", float(calculate_payout(row.bet_amount))
+    return "loss", 0.0
+
+
+async def list_matches(
+    db: AsyncSession, user_id: uuid.UUID, limit: int, cursor: str | None = None
+) -> MatchPage:
+    """One page of a user's match history, newest first.
+
+    Three queries whatever the page size: the page itself, the opponents
+    on it, and the user's maintained match_count for the total. The page
+    merges a keyset scan of each seat's (player, created_at, match_id)
+    index, so deep pages cost the same as the first.
+    """
+    seats = union_all(
+        _seat_query(user_id, 1, limit + 1, cursor),
+        _seat_query(user_id, 2, limit + 1, cursor),
+    ).subquery()
+    rows = (
+        await db.execute(
+            select(seats)
+            .order_by(seats.c.created_at.desc(), seats.c.match_id.desc())
+            .limit(limit + 1)
+        )
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = pagination.encode_cursor(rows[-1].created_at, rows[-1].match_id)
+
+    opponents = {}
+    if rows:
+        result = await db.execute(
+            select(User.user_id, User.username, User.trophy_level).where(
+                User.user_id.in_({row.opponent_id for row in rows})
+            )
+        )
+        opponents = {row.user_id: row for row in result}
+
+    total = await db.scalar(
+        select(UserStats.match_count).where(UserStats.user_id == user_id)
+    )
+
+    matches = []
+    for row in rows:
+        opponent = opponents.get(row.opponent_id)
+        result, payout = _result(user_id, row)
+        matches.append(
+            MatchResponse.model_construct(
+                match_id=row.match_id,
+                opponent=OpponentInfo.model_construct(
+                    username=opponent.username if opponent else "",
+                    player_tag=row.opponent_tag,
+                    trophy_level=opponent.trophy_level if opponent else None,
+                ),
+                bet_amount=float(row.bet_amount),
+                status=row.status,
+                result=result,
+                payout=payout,
+                created_at=row.created_at,
+                completed_at=row.completed_at,
+            )
+        )
+    return MatchPage(matches, total or 0, next_cursor)
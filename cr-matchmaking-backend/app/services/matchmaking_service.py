@@ -0,0 +1,550 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from redis.asyncio import Redis
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.match import Match
+from app.models.transaction import TX_TYPE_BET_PLACED, Transaction
+from app.models.user import User, UserBalance
+from app.schemas.match import OpponentInfo
+from app.schemas.matchmaking import (
+    JoinQueueRequest,
+    JoinQueueResponse,
+    MatchFoundEvent,
+    QueueStatusResponse,
+)
+from app.services import event_service, stats_service
+from app.utils import redis_client
+from app.utils.exceptions import AppException, InsufficientBalance
+
+logger = logging.getLogger(__name__)
+
+# Per bracket: trophies by player, and join time (ms) by player
+QUEUE_PREFIX = "mm:queue:"
+WAITING_PREFIX = "mm:waiting:"
+# user_id -> bracket for every queued player, across all brackets
+PLAYERS_KEY = "mm:players"
+# Brackets with at least one queued player, walked by the matcher
+BRACKETS_KEY = "mm:brackets"
+# Held by whichever worker pushes a bracket's queue positions this interval
+STATUS_PUSH_PREFIX = "mm:status_push:"
+# user_id -> last join time (ms); the trophy refresher serves these first
+RECENT_KEY = "mm:recent"
+
+_LUA_COMMON = """
+local queue, waiting, players, brackets = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local base = tonumber(ARGV[1])
+local growth = tonumber(ARGV[2])
+local max_window = tonumber(ARGV[3])
+local limit = tonumber(ARGV[4])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+-- The window is set by whoever of the two has waited longest
+local function window(joined_ms)
+    return math.min(max_window, base + growth * (now - joined_ms) / 1000)
+end
+
+-- Closest queued player within the widened window, or nil.
+-- Also returns the distance to the nearest player regardless of window.
+local function find_opponent(uid, trophies, joined)
+    local best, best_diff, best_trophies, best_joined
+    local nearest = -1
+    local ranges = {
+        redis.call('ZRANGEBYSCORE', queue, trophies, trophies + max_window,
+            'WITHSCORES', 'LIMIT', 0, limit),
+        redis.call('ZREVRANGEBYSCORE', queue, trophies, trophies - max_window,
+            'WITHSCORES', 'LIMIT', 0, limit),
+    }
+    for _, members in ipairs(ranges) do
+        for i = 1, #members, 2 do
+            local cand = members[i]
+            if cand ~= uid then
+                local score = tonumber(members[i + 1])
+                local diff = math.abs(score - trophies)
+                if nearest < 0 or diff < nearest then
+                    nearest = diff
+                end
+                local cand_joined = tonumber(redis.call('ZSCORE', waiting, cand))
+                if diff <= window(math.min(joined, cand_joined))
+                    and (best_diff == nil or diff < best_diff) then
+                    best, best_diff = cand, diff
+                    best_trophies, best_joined = score, cand_joined
+                end
+            end
+        end
+    end
+    return best, best_trophies, best_joined, nearest
+end
+
+local function remove(uid)
+    redis.call('ZREM', queue, uid)
+    redis.call('ZREM', waiting, uid)
+    redis.call('HDEL', players, uid)
+end
+
+local function drop_bracket_if_empty(bracket)
+    if redis.call('ZCARD', queue) == 0 then
+        redis.call('SREM', brackets, bracket)
+    end
+end
+"""
+
+# ARGV[5..9]: user_id, bracket, trophies, joined_ms (empty for "now"),
+# "1" to pair on the spot or "0" to only queue.
+# Returns {1, opponent, trophies, joined_ms} when paired on the spot,
+# {0, rank, nearest_distance} when queued, or {-1} if already queued.
+JOIN_LUA = (
+    _LUA_COMMON
+    + """
+local uid, bracket = ARGV[5], ARGV[6]
+local trophies = tonumber(ARGV[7])
+local joined = tonumber(ARGV[8]) or now
+
+if redis.call('HEXISTS', players, uid) == 1 then
+    return {-1}
+end
+
+local nearest = -1
+if ARGV[9] == '1' then
+    local opp, opp_trophies, opp_joined
+    opp, opp_trophies, opp_joined, nearest = find_opponent(uid, trophies, joined)
+    if opp then
+        remove(opp)
+        drop_bracket_if_empty(bracket)
+        return {1, opp, opp_trophies, opp_joined}
+    end
+end
+
+redis.call('ZADD', queue, trophies, uid)
+redis.call('ZADD', waiting, joined, uid)
+redis.call('HSET', players, uid, bracket)
+redis.call('SADD', brackets, bracket)
+return {0, redis.call('ZRANK', waiting, uid), nearest}
+"""
+)
+
+# ARGV[5..6]: bracket, number of longest-waiting players to try.
+# Returns a flat list of (user_id, trophies, joined_ms) x 2 per pairing.
+SWEEP_LUA = (
+    _LUA_COMMON
+    + """
+local bracket = ARGV[5]
+local batch = tonumber(ARGV[6])
+local oldest = redis.call('ZRANGE', waiting, 0, batch - 1, 'WITHSCORES')
+local paired = {}
+for i = 1, #oldest, 2 do
+    local uid = oldest[i]
+    local joined = tonumber(oldest[i + 1])
+    local trophies = tonumber(redis.call('ZSCORE', queue, uid))
+    if trophies then
+        local opp, opp_trophies, opp_joined = find_opponent(uid, trophies, joined)
+        if opp then
+            remove(uid)
+            remove(opp)
+            local pairing = {uid, trophies, joined, opp, opp_trophies, opp_joined}
+            for _, v in ipairs(pairing) do
+                paired[#paired + 1] = v
+            end
+        end
+    end
+end
+drop_bracket_if_empty(bracket)
+return paired
+"""
+)
+
+# ARGV[5..6]: user_id, bracket. Returns 1 if the player was removed.
+LEAVE_LUA = (
+    _LUA_COMMON
+    + """
+local uid, bracket = ARGV[5], ARGV[6]
+if redis.call('HGET', players, uid) ~= bracket then
+    return 0
+end
+remove(uid)
+drop_bracket_if_empty(bracket)
+return 1
+"""
+)
+
+
+class QueuedPlayer(NamedTuple):
+    user_id: uuid.UUID
+    trophies: int
+    # None for a player who is joining right now
+    joined_ms: int | None
+
+
+class NewMatch(NamedTuple):
+    match_id: uuid.UUID
+    # The match-found event each player should receive
+    events: dict[uuid.UUID, MatchFoundEvent]
+
+
+def _bracket(bet_amount: float) -> str:
+    return str(Decimal(str(bet_amount)).quantize(Decimal("0.01")))
+
+
+def _keys(bracket: str) -> list[str]:
+    return [
+        f"{QUEUE_PREFIX}{bracket}",
+        f"{WAITING_PREFIX}{bracket}",
+        PLAYERS_KEY,
+        BRACKETS_KEY,
+    ]
+
+
+def _window_args() -> list[int | float]:
+    return [
+        settings.MATCHMAKING_BASE_TROPHY_WINDOW,
+        settings.MATCHMAKING_WINDOW_GROWTH_PER_SECOND,
+        settings.MATCHMAKING_MAX_TROPHY_WINDOW,
+        settings.MATCHMAKING_CANDIDATE_LIMIT,
+    ]
+
+
+def _estimate_wait(nearest_distance: int) -> int:
+    """Seconds until the trophy window reaches the nearest queued player."""
+    base = settings.MATCHMAKING_BASE_TROPHY_WINDOW
+    growth = settings.MATCHMAKING_WINDOW_GROWTH_PER_SECOND
+    if nearest_distance < 0:
+        nearest_distance = settings.MATCHMAKING_MAX_TROPHY_WINDOW
+    return max(0, int((nearest_distance - base) / growth))
+
+
+async def _enqueue(
+    redis: Redis, bracket: str, player: QueuedPlayer, pair: bool = True
+) -> list:
+    script = redis_client.get_script(JOIN_LUA)
+    return await script(
+        keys=_keys(bracket),
+        args=[
+            *_window_args(),
+            str(player.user_id),
+            bracket,
+            player.trophies,
+            player.joined_ms if player.joined_ms is not None else "",
+            "1" if pair else "0",
+        ],
+    )
+
+
+async def join_queue(
+    db: AsyncSession, redis: Redis, user: User, request: JoinQueueRequest
+) -> JoinQueueResponse:
+    if not (settings.MIN_BET_AMOUNT <= request.bet_amount <= settings.MAX_BET_AMOUNT):
+        raise AppException(
+            code="INVALID_BET_AMOUNT",
+            message="Bet amount is outside the allowed range",
+            status_code=400,
+            details={
+                "min": settings.MIN_BET_AMOUNT,
+                "max": settings.MAX_BET_AMOUNT,
+            },
+        )
+
+    bracket = _bracket(request.bet_amount)
+    result = await db.execute(
+        select(UserBalance.balance).where(UserBalance.user_id == user.user_id)
+    )
+    available = result.scalar_one_or_none() or Decimal("0.00")
+    if available < Decimal(bracket):
+        raise InsufficientBalance(float(available), float(bracket))
+
+    player = QueuedPlayer(user.user_id, user.trophy_level or 0, None)
+    outcome = await _enqueue(redis, bracket, player)
+
+    if outcome[0] == -1:
+        raise AppException(
+            code="ALREADY_IN_QUEUE",
+            message="You are already in the matchmaking queue",
+            status_code=409,
+        )
+    await redis.zadd(RECENT_KEY, {str(user.user_id): int(time.time() * 1000)})
+    if outcome[0] == 1:
+        opponent = QueuedPlayer(uuid.UUID(outcome[1]), outcome[2], outcome[3])
+        match_id, unfunded = await _pair(db, redis, bracket, opponent, player)
+        if match_id is not None:
+            return JoinQueueResponse(
+                queue_id=bracket, position=0, estimated_wait_time=0
+            )
+        if user.user_id in unfunded:
+            raise InsufficientBalance(float(available), float(bracket))
+        # The opponent could not cover the stake; we were queued instead
+        status = await get_queue_status(redis, user)
+        return JoinQueueResponse(
+            queue_id=bracket,
+            position=status.queue_position or 1,
+            estimated_wait_time=_estimate_wait(-1),
+        )
+
+    return JoinQueueResponse(
+        queue_id=bracket,
+        position=outcome[1] + 1,
+        estimated_wait_time=_estimate_wait(outcome[2]),
+    )
+
+
+async def leave_queue(redis: Redis, user: User) -> None:
+    bracket = await redis.hget(PLAYERS_KEY, str(user.user_id))
+    if bracket is None:
+        raise AppException(
+            code="NOT_IN_QUEUE",
+            message="You are not in the matchmaking queue",
+            status_code=404,
+        )
+    script = redis_client.get_script(LEAVE_LUA)
+    await script(
+        keys=_keys(bracket), args=[*_window_args(), str(user.user_id), bracket]
+    )
+
+
+async def get_queue_status(redis: Redis, user: User) -> QueueStatusResponse:
+    uid = str(user.user_id)
+    bracket = await redis.hget(PLAYERS_KEY, uid)
+    if bracket is None:
+        return QueueStatusResponse(in_queue=False)
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zrank(f"{WAITING_PREFIX}{bracket}", uid)
+        pipe.zscore(f"{WAITING_PREFIX}{bracket}", uid)
+        pipe.time()
+        rank, joined_ms, (now_s, now_us) = await pipe.execute()
+
+    if rank is None:
+        # Paired between the two reads
+        return QueueStatusResponse(in_queue=False)
+
+    now_ms = now_s * 1000 + now_us // 1000
+    return QueueStatusResponse(
+        in_queue=True,
+        bet_amount=float(bracket),
+        queue_position=rank + 1,
+        wait_time=max(0, int((now_ms - joined_ms) / 1000)),
+    )
+
+
+async def _create_match(
+    db: AsyncSession,
+    player1_id: uuid.UUID,
+    player2_id: uuid.UUID,
+    bet: Decimal,
+) -> tuple[NewMatch | None, list[uuid.UUID]]:
+    """Escrow both stakes and insert the match in one transaction.
+
+    Returns the new match, or ``None`` plus the players whose stake could
+    not be escrowed.
+    """
+    player_ids = [player1_id, player2_id]
+    escrowed = await db.execute(
+        update(UserBalance)
+        .where(UserBalance.user_id.in_(player_ids), UserBalance.balance >= bet)
+        .values(
+            balance=UserBalance.balance - bet,
+            escrowed=UserBalance.escrowed + bet,
+            lifetime_wagered=UserBalance.lifetime_wagered + bet,
+        )
+        .returning(UserBalance.user_id, UserBalance.balance)
+        .execution_options(synchronize_session=False)
+    )
+    balances_after = {row.user_id: row.balance for row in escrowed}
+    if len(balances_after) < 2:
+        await db.rollback()
+        return None, [p for p in player_ids if p not in balances_after]
+
+    result = await db.execute(
+        select(
+            User.user_id, User.username, User.cr_player_tag, User.trophy_level
+        ).where(User.user_id.in_(player_ids))
+    )
+    players = {
+        row.user_id: OpponentInfo(
+            username=row.username,
+            player_tag=row.cr_player_tag,
+            trophy_level=row.trophy_level,
+        )
+        for row in result
+    }
+
+    result = await db.execute(
+        insert(Match)
+        .values(
+            player1_id=player1_id,
+            player2_id=player2_id,
+            player1_tag=players[player1_id].player_tag,
+            player2_tag=players[player2_id].player_tag,
+            bet_amount=bet,
+            expires_at=func.now() + timedelta(minutes=settings.MATCH_TIMEOUT_MINUTES),
+        )
+        .returning(Match.match_id, Match.expires_at)
+    )
+    match_id, expires_at = result.one()
+
+    await db.execute(
+        insert(Transaction).values(
+            [
+                {
+                    "user_id": player_id,
+                    "type": TX_TYPE_BET_PLACED,
+                    "amount": bet,
+                    "balance_before": balances_after[player_id] + bet,
+                    "balance_after": balances_after[player_id],
+                    "match_id": match_id,
+                }
+                for player_id in player_ids
+            ]
+        )
+    )
+    await stats_service.record_matches_created(db, player_ids)
+    await db.commit()
+
+    events = {
+        player_id: MatchFoundEvent(
+            match_id=match_id,
+            opponent=players[opponent_id],
+            bet_amount=float(bet),
+            expires_at=expires_at,
+        )
+        for player_id, opponent_id in (
+            (player1_id, player2_id),
+            (player2_id, player1_id),
+        )
+    }
+    return NewMatch(match_id, events), []
+
+
+async def _pair(
+    db: AsyncSession,
+    redis: Redis,
+    bracket: str,
+    first: QueuedPlayer,
+    second: QueuedPlayer,
+) -> tuple[uuid.UUID | None, list[uuid.UUID]]:
+    """Turn a pairing claimed from Redis into a match.
+
+    If the match cannot be created, players who can still cover the stake go
+    back into the queue with their original join time. A player who is
+    joining right now is only requeued when the failure was the opponent's.
+    """
+    try:
+        new_match, unfunded = await _create_match(
+            db, first.user_id, second.user_id, Decimal(bracket)
+        )
+    except Exception:
+        await db.rollback()
+        for player in (first, second):
+            if player.joined_ms is not None:
+                await _enqueue(redis, bracket, player, pair=False)
+        raise
+
+    if new_match is None:
+        for player in (first, second):
+            if player.user_id not in unfunded:
+                await _enqueue(redis, bracket, player, pair=False)
+        return None, unfunded
+
+    # Escrow moved lifetime_wagered
+    await stats_service.bump_versions(redis, new_match.events)
+    await event_service.publish_many(
+        redis,
+        [
+            (player_id, event_service.EVENT_MATCH_FOUND, event)
+            for player_id, event in new_match.events.items()
+        ],
+    )
+    return new_match.match_id, unfunded
+
+
+async def _push_positions(redis: Redis, bracket: str) -> None:
+    """Push queue position to every player waiting in a bracket.
+
+    At most one worker does this per bracket per
+    QUEUE_STATUS_PUSH_INTERVAL_SECONDS, so clients need not poll for it.
+    """
+    interval_ms = int(settings.QUEUE_STATUS_PUSH_INTERVAL_SECONDS * 1000)
+    if not await redis.set(
+        f"{STATUS_PUSH_PREFIX}{bracket}", "1", nx=True, px=interval_ms
+    ):
+        return
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zrange(f"{WAITING_PREFIX}{bracket}", 0, -1, withscores=True)
+        pipe.time()
+        waiting, (now_s, now_us) = await pipe.execute()
+    if not waiting:
+        return
+
+    now_ms = now_s * 1000 + now_us // 1000
+    await event_service.publish_many(
+        redis,
+        [
+            (
+                uuid.UUID(uid),
+                event_service.EVENT_QUEUE_STATUS,
+                QueueStatusResponse(
+                    in_queue=True,
+                    bet_amount=float(bracket),
+                    queue_position=position,
+                    wait_time=max(0, int((now_ms - joined_ms) / 1000)),
+                ),
+            )
+            for position, (uid, joined_ms) in enumerate(waiting, start=1)
+        ],
+    )
+
+
+async def sweep_bracket(redis: Redis, bracket: str) -> int:
+    """Pair players whose trophy windows have widened. Returns matches created.
+
+    The script has already taken every returned pair out of the queue, so a
+    pair that fails must not stop the rest: _pair requeues its own players
+    and the sweep moves on to the next pair.
+    """
+    script = redis_client.get_script(SWEEP_LUA)
+    flat = await script(
+        keys=_keys(bracket),
+        args=[*_window_args(), bracket, settings.MATCHMAKING_SWEEP_BATCH_SIZE],
+    )
+
+    created = 0
+    for i in range(0, len(flat), 6):
+        first = QueuedPlayer(uuid.UUID(flat[i]), flat[i + 1], flat[i + 2])
+        second = QueuedPlayer(uuid.UUID(flat[i + 3]), flat[i + 4], flat[i + 5])
+        try:
+            async with async_session() as db:
+                match_id, _ = await _pair(db, redis, bracket, first, second)
+        except Exception:
+            logger.exception("Pairing %s with %s failed", first.user_id, second.user_id)
+            continue
+        if match_id is not None:
+            created += 1
+    return created
+
+
+async def run_matcher() -> None:
+    """Background loop that re-tries pairing as waiting players' windows widen.
+
+    Safe to run on every worker at once: each sweep is a single atomic script
+    per bracket, so a player can only ever be claimed by one worker.
+    """
+    while True:
+        redis = redis_client.redis_client
+        if redis is not None:
+            try:
+                for bracket in await redis.smembers(BRACKETS_KEY):
+                    await sweep_bracket(redis, bracket)
+                    await _push_positions(redis, bracket)
+            except Exception:
+                logger.exception("Matchmaking sweep failed")
+        await asyncio.sleep(settings.MATCHMAKING_SWEEP_INTERVAL_SECONDS)
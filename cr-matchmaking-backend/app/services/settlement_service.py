@@ -0,0 +1,326 @@
+import uuid
+from collections import defaultdict
+from collections.abc import Sequence
+from datetime import datetime
+from decimal import ROUND_DOWN, Decimal
+from typing import NamedTuple
+
+from redis.asyncio import Redis
+from sqlalchemy import (
+    DateTime,
+    Numeric,
+    String,
+    cast,
+    column,
+    exists,
+    func,
+    insert,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config import settings
+from app.models.match import MATCH_STATUS_ACTIVE, MATCH_STATUS_COMPLETED, Match
+from app.models.transaction import (
+    TX_TYPE_LOSS,
+    TX_TYPE_REFUND,
+    TX_TYPE_WIN,
+    Transaction,
+)
+from app.models.user import UserBalance
+from app.schemas.matchmaking import MatchResultEvent
+from app.services import event_service, stats_service
+
+CENT = Decimal("0.01")
+
+
+class MatchDecision(NamedTuple):
+    match_id: uuid.UUID
+    # None for a draw
+    winner_id: uuid.UUID | None
+    battle_time: datetime | None
+    # Identifies the battle that decided the match (BattleSummary.fingerprint)
+    battle_fingerprint: str | None = None
+
+
+class SettledMatch(NamedTuple):
+    match_id: uuid.UUID
+    player1_id: uuid.UUID
+    player2_id: uuid.UUID
+    winner_id: uuid.UUID | None
+    bet_amount: Decimal
+    payout: Decimal
+
+
+class BalanceMove(NamedTuple):
+    """One ledger entry and its effect on a user's balance row."""
+
+    user_id: uuid.UUID
+    match_id: uuid.UUID
+    tx_type: str
+    amount: Decimal
+    credit: Decimal
+    release: Decimal
+    won: Decimal
+
+
+def calculate_payout(bet_amount: Decimal) -> Decimal:
+    pot = bet_amount * 2
+    fee = pot * Decimal(str(settings.PLATFORM_FEE_PERCENTAGE)) / 100
+    return (pot - fee).quantize(CENT, rounding=ROUND_DOWN)
+
+
+async def apply_balance_moves(db: AsyncSession, moves: Sequence[BalanceMove]) -> None:
+    """Apply balance moves and write their ledger rows, set-based.
+
+    Balance rows are locked in user_id order first, so concurrent batches
+    touching the same players queue up instead of deadlocking. All balances
+    are then updated by one UPDATE ... FROM (VALUES ...) RETURNING, and all
+    ledger rows are written by one INSERT. Does not commit.
+    """
+    if not moves:
+        return
+
+    per_user: dict[uuid.UUID, list[BalanceMove]] = defaultdict(list)
+    for move in moves:
+        per_user[move.user_id].append(move)
+    user_ids = sorted(per_user)
+
+    await db.execute(
+        select(UserBalance.user_id)
+        .where(UserBalance.user_id.in_(user_ids))
+        .order_by(UserBalance.user_id)
+        .with_for_update()
+    )
+
+    totals = values(
+        column("user_id", UUID(as_uuid=True)),
+        column("credit", Numeric(10, 2)),
+        column("release", Numeric(10, 2)),
+        column("won", Numeric(10, 2)),
+        name="totals",
+    ).data(
+        [
+            (
+                user_id,
+                sum((m.credit for m in per_user[user_id]), Decimal("0")),
+                sum((m.release for m in per_user[user_id]), Decimal("0")),
+                sum((m.won for m in per_user[user_id]), Decimal("0")),
+            )
+            for user_id in user_ids
+        ]
+    )
+    result = await db.execute(
+        update(UserBalance)
+        .where(UserBalance.user_id == totals.c.user_id)
+        .values(
+            balance=UserBalance.balance + totals.c.credit,
+            escrowed=UserBalance.escrowed - totals.c.release,
+            lifetime_won=UserBalance.lifetime_won + totals.c.won,
+        )
+        .returning(
+            UserBalance.user_id,
+            (UserBalance.balance - totals.c.credit).label("balance_before"),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    ledger = []
+    for row in result:
+        running = row.balance_before
+        for move in per_user[row.user_id]:
+            ledger.append(
+                {
+                    "user_id": move.user_id,
+                    "type": move.tx_type,
+                    "amount": move.amount,
+                    "balance_before": running,
+                    "balance_after": running + move.credit,
+                    "match_id": move.match_id,
+                }
+            )
+            running += move.credit
+
+    await db.execute(insert(Transaction).values(ledger))
+
+
+def _settlement_moves(match: SettledMatch) -> list[BalanceMove]:
+    bet = match.bet_amount
+    players = (match.player1_id, match.player2_id)
+    zero = Decimal("0.00")
+
+    if match.winner_id is None:
+        return [
+            BalanceMove(p, match.match_id, TX_TYPE_REFUND, bet, bet, bet, zero)
+            for p in players
+        ]
+
+    loser_id = (
+        match.player2_id if match.winner_id == match.player1_id else match.player1_id
+    )
+    return [
+        BalanceMove(
+            match.winner_id,
+            match.match_id,
+            TX_TYPE_WIN,
+            match.payout,
+            match.payout,
+            bet,
+            match.payout,
+        ),
+        BalanceMove(loser_id, match.match_id, TX_TYPE_LOSS, bet, zero, bet, zero),
+    ]
+
+
+async def settle_matches(
+    db: AsyncSession, decisions: Sequence[MatchDecision]
+) -> list[SettledMatch]:
+    """Complete a batch of decided matches and pay them out in one transaction.
+
+    Exactly-once payout comes from the conditional status transition: only
+    matches this call moves from active to completed are paid, and matches
+    another worker is already settling are skipped rather than waited on.
+    A battle pays out at most once too: its fingerprint is recorded on the
+    match in the same transaction, decisions whose battle already settled a
+    match are skipped, and the unique index rejects a concurrent second use.
+    Returns the matches that were actually settled.
+    """
+    if not decisions:
+        return []
+
+    by_id: dict[uuid.UUID, MatchDecision] = {}
+    fingerprints: set[str] = set()
+    for decision in decisions:
+        fingerprint = decision.battle_fingerprint
+        if fingerprint is not None:
+            if fingerprint in fingerprints:
+                continue
+            fingerprints.add(fingerprint)
+        by_id[decision.match_id] = decision
+    claimed = await db.execute(
+        select(Match.match_id)
+        .where(Match.match_id.in_(sorted(by_id)), Match.status == MATCH_STATUS_ACTIVE)
+        .order_by(Match.match_id)
+        .with_for_update(skip_locked=True)
+    )
+    claimed_ids = list(claimed.scalars())
+    if not claimed_ids:
+        await db.rollback()
+        return []
+
+    decided = values(
+        column("match_id", UUID(as_uuid=True)),
+        column("winner_id", UUID(as_uuid=True)),
+        column("battle_time", DateTime()),
+        column("battle_fingerprint", String(64)),
+        name="decided",
+    ).data(
+        [
+            (i, by_id[i].winner_id, by_id[i].battle_time, by_id[i].battle_fingerprint)
+            for i in claimed_ids
+        ]
+    )
+    # A column that is NULL in every row (a batch of draws, or of decisions
+    # without a battle) comes out of VALUES as text, which Postgres won't
+    # compare with or assign to the typed match columns
+    winner_id = cast(decided.c.winner_id, UUID(as_uuid=True))
+    battle_time = cast(decided.c.battle_time, DateTime())
+    battle_fingerprint = cast(decided.c.battle_fingerprint, String(64))
+    settled_by = aliased(Match)
+    result = await db.execute(
+        update(Match)
+        .where(
+            Match.match_id == decided.c.match_id,
+            Match.status == MATCH_STATUS_ACTIVE,
+            or_(
+                winner_id.is_(None),
+                winner_id == Match.player1_id,
+                winner_id == Match.player2_id,
+            ),
+            ~exists().where(settled_by.battle_fingerprint == battle_fingerprint),
+        )
+        .values(
+            status=MATCH_STATUS_COMPLETED,
+            winner_id=winner_id,
+            battle_time=battle_time,
+            battle_fingerprint=battle_fingerprint,
+            completed_at=func.now(),
+        )
+        .returning(
+            Match.match_id,
+            Match.player1_id,
+            Match.player2_id,
+            Match.winner_id,
+            Match.bet_amount,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    settled = [
+        SettledMatch(
+            row.match_id,
+            row.player1_id,
+            row.player2_id,
+            row.winner_id,
+            row.bet_amount,
+            calculate_payout(row.bet_amount) if row.winner_id else row.bet_amount,
+        )
+        for row in result
+    ]
+
+    await apply_balance_moves(
+        db, [move for match in settled for move in _settlement_moves(match)]
+    )
+    await stats_service.record_match_results(
+        db, [(m.player1_id, m.player2_id, m.winner_id) for m in settled]
+    )
+    await db.commit()
+    return settled
+
+
+async def settle_in_batches(
+    db: AsyncSession, decisions: Sequence[MatchDecision]
+) -> list[SettledMatch]:
+    """Settle any number of decisions, one transaction per SETTLEMENT_BATCH_SIZE."""
+    settled: list[SettledMatch] = []
+    size = settings.SETTLEMENT_BATCH_SIZE
+    for start in range(0, len(decisions), size):
+        settled.extend(await settle_matches(db, decisions[start : start + size]))
+    return settled
+
+
+async def notify_settled(redis: Redis, settled: Sequence[SettledMatch]) -> None:
+    """Push a match-result event to both players of each settled match.
+
+    Also bumps their stats versions, so /me/stats ETags change.
+    """
+    events = []
+    for match in settled:
+        for player_id in (match.player1_id, match.player2_id):
+            if match.winner_id is None:
+                result, payout = "draw", match.bet_amount
+            elif match.winner_id == player_id:
+                result, payout = "win", match.payout
+            else:
+                result, payout = "loss", Decimal("0.00")
+            events.append(
+                (
+                    player_id,
+                    event_service.EVENT_MATCH_RESULT,
+                    MatchResultEvent(
+                        match_id=match.match_id,
+                        status=MATCH_STATUS_COMPLETED,
+                        result=result,
+                        payout=float(payout),
+                    ),
+                )
+            )
+    await stats_service.bump_versions(
+        redis, (p for m in settled for p in (m.player1_id, m.player2_id))
+    )
+    if events:
+        await event_service.publish_many(redis, events)
@@ -0,0 +1,167 @@
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable
+
+from redis.asyncio import Redis
+from sqlalchemy import delete, func, insert, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import READ_PIN_PREFIX
+from app.models.match import MATCH_STATUS_COMPLETED, Match
+from app.models.user import UserStats
+
+STATS_VERSION_PREFIX = "stats_version:"
+
+# (player1_id, player2_id, winner_id); winner_id is None for a draw
+MatchOutcome = tuple[uuid.UUID, uuid.UUID, uuid.UUID | None]
+
+_COUNTERS = ("total_matches", "wins", "losses", "draws")
+
+
+async def record_match_results(
+    db: AsyncSession, outcomes: Iterable[MatchOutcome]
+) -> None:
+    """Add completed matches to the players' counters in one upsert.
+
+    Does not commit; call it inside the transaction that completes the matches.
+    """
+    deltas: dict[uuid.UUID, dict[str, int]] = defaultdict(
+        lambda: dict.fromkeys(_COUNTERS, 0)
+    )
+    for player1_id, player2_id, winner_id in outcomes:
+        for player_id in (player1_id, player2_id):
+            delta = deltas[player_id]
+            delta["total_matches"] += 1
+            if winner_id is None:
+                delta["draws"] += 1
+            elif winner_id == player_id:
+                delta["wins"] += 1
+            else:
+                delta["losses"] += 1
+
+    if not deltas:
+        return
+
+    # Sorted so concurrent settlements lock stats rows in the same order
+    stmt = pg_insert(UserStats).values(
+        [{"user_id": user_id, **deltas[user_id]} for user_id in sorted(deltas)]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserStats.user_id],
+        set_={
+            counter: getattr(UserStats, counter) + getattr(stmt.excluded, counter)
+            for counter in _COUNTERS
+        }
+        | {"updated_at": func.now()},
+    )
+    await db.execute(stmt)
+
+
+async def record_matches_created(
+    db: AsyncSession, player_ids: Iterable[uuid.UUID]
+) -> None:
+    """Count new matches towards each player's match_count. Does not commit."""
+    counts: dict[uuid.UUID, int] = defaultdict(int)
+    for player_id in player_ids:
+        counts[player_id] += 1
+    if not counts:
+        return
+
+    stmt = pg_insert(UserStats).values(
+        [
+            {"user_id": user_id, "match_count": counts[user_id]}
+            for user_id in sorted(counts)
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserStats.user_id],
+        set_={"match_count": UserStats.match_count + stmt.excluded.match_count},
+    )
+    await db.execute(stmt)
+
+
+async def rebuild_all(db: AsyncSession) -> int:
+    """Recompute every user's counters from the matches table.
+
+    user_stats is locked against writes for the whole rebuild. Settlement and
+    match creation upsert it in the same transaction as their matches, so
+    they wait for the rebuild to commit and then add to the rebuilt rows,
+    and the rebuild only starts once those already running have committed.
+    Without the lock, a match committing between the rebuild's read and its
+    insert would be lost or counted twice.
+
+    Returns the number of users with at least one match.
+    """
+    participants = union_all(
+        select(Match.player1_id.label("user_id"), Match.status, Match.winner_id),
+        select(Match.player2_id.label("user_id"), Match.status, Match.winner_id),
+    ).subquery()
+
+    completed = participants.c.status == MATCH_STATUS_COMPLETED
+    total = func.count().filter(completed)
+    wins = func.count().filter(
+        completed, participants.c.winner_id == participants.c.user_id
+    )
+    draws = func.count().filter(completed, participants.c.winner_id.is_(None))
+    totals = select(
+        participants.c.user_id, total, wins, total - wins - draws, draws, func.count()
+    ).group_by(participants.c.user_id)
+
+    await db.execute(text("LOCK TABLE user_stats IN SHARE ROW EXCLUSIVE MODE"))
+    await db.execute(delete(UserStats))
+    result = await db.execute(
+        insert(UserStats).from_select(["user_id", *_COUNTERS, "match_count"], totals)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def get_version(redis: Redis, user_id: uuid.UUID) -> str:
+    """Current version of a user's stats, for ETags.
+
+    A missing key (never set, expired or evicted) starts again from the
+    current time in ms, so it never repeats a version handed out before.
+    """
+    key = f"{STATS_VERSION_PREFIX}{user_id}"
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set(
+            key,
+            int(time.time() * 1000),
+            nx=True,
+            ex=settings.STATS_VERSION_TTL_SECONDS,
+        )
+        pipe.get(key)
+        _, version = await pipe.execute()
+    return version
+
+
+async def bump_versions(redis: Redis, user_ids: Iterable[uuid.UUID]) -> None:
+    """Mark users' stats as changed. Call after the change is committed.
+
+    The users are also pinned to the primary, so the next read does not
+    return pre-change stats from a lagging replica under the new version.
+    """
+    now_ms = int(time.time() * 1000)
+    pin_ms = int(settings.DB_READ_YOUR_WRITES_SECONDS * 1000)
+    async with redis.pipeline(transaction=False) as pipe:
+        for user_id in set(user_ids):
+            key = f"{STATS_VERSION_PREFIX}{user_id}"
+            pipe.set(key, now_ms, nx=True, ex=settings.STATS_VERSION_TTL_SECONDS)
+            pipe.incr(key)
+            pipe.set(f"{READ_PIN_PREFIX}{user_id}", "1", px=pin_ms)
+        await pipe.execute()
+
+
+async def reset_versions(redis: Redis) -> None:
+    """Drop every stats version, e.g. after rebuilding all stats."""
+    batch = []
+    async for key in redis.scan_iter(match=f"{STATS_VERSION_PREFIX}*", count=1000):
+        batch.append(key)
+        if len(batch) >= 1000:
+            await redis.delete(*batch)
+            batch.clear()
+    if batch:
+        await redis.delete(*batch)
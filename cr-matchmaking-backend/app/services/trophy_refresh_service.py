@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import Sequence
+from typing import NamedTuple
+
+from redis.asyncio import Redis
+from sqlalchemy import Integer, String, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.user import User
+from app.services import cr_api_service, user_cache_service
+from app.services.matchmaking_service import RECENT_KEY
+from app.utils import cr_quota, lease, redis_client
+from app.utils.exceptions import CRAPIRateLimited, InvalidPlayerTag
+
+logger = logging.getLogger(__name__)
+
+LEADER_KEY = "trophy_refresh:leader"
+# Last user_id reached by the keyset walk over verified users
+CURSOR_KEY = "trophy_refresh:cursor"
+
+
+class LinkedPlayer(NamedTuple):
+    user_id: uuid.UUID
+    player_tag: str
+
+
+class TrophyUpdate(NamedTuple):
+    user_id: uuid.UUID
+    player_tag: str
+    trophies: int
+
+
+async def _recent_user_ids(redis: Redis, limit: int) -> list[uuid.UUID]:
+    """Users who joined the queue recently, most recent first."""
+    since_ms = int((time.time() - settings.TROPHY_REFRESH_RECENT_SECONDS) * 1000)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zremrangebyscore(RECENT_KEY, "-inf", since_ms)
+        pipe.zrevrange(RECENT_KEY, 0, limit - 1)
+        _, recent = await pipe.execute()
+    return [uuid.UUID(uid) for uid in recent]
+
+
+def _verified() -> tuple:
+    return (User.cr_player_verified.is_(True), User.cr_player_tag.is_not(None))
+
+
+async def _load_players(
+    db: AsyncSession, user_ids: Sequence[uuid.UUID]
+) -> list[LinkedPlayer]:
+    if not user_ids:
+        return []
+    result = await db.execute(
+        select(User.user_id, User.cr_player_tag).where(
+            User.user_id.in_(user_ids), *_verified()
+        )
+    )
+    return [LinkedPlayer(*row) for row in result]
+
+
+async def _load_page(
+    db: AsyncSession, after: uuid.UUID | None, limit: int
+) -> list[LinkedPlayer]:
+    """The next verified users in user_id order (primary-key keyset)."""
+    query = (
+        select(User.user_id, User.cr_player_tag)
+        .where(*_verified())
+        .order_by(User.user_id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(User.user_id > after)
+    return [LinkedPlayer(*row) for row in await db.execute(query)]
+
+
+async def fetch_trophies(
+    players: Sequence[LinkedPlayer],
+) -> tuple[list[TrophyUpdate], bool]:
+    """Fetch current trophies at background priority, a few at a time.
+
+    Stops early once the quota governor turns background calls away, so
+    the refresher never eats into the budget reserved for user traffic.
+    Returns the updates and whether it was throttled.
+    """
+    slots = asyncio.Semaphore(settings.TROPHY_REFRESH_CONCURRENCY)
+    throttled = False
+
+    async def fetch(player: LinkedPlayer) -> TrophyUpdate | None:
+        nonlocal throttled
+        async with slots:
+            if throttled:
+                return None
+            try:
+                profile = await cr_api_service.get_player(
+                    player.player_tag, priority=cr_quota.PRIORITY_BACKGROUND
+                )
+            except CRAPIRateLimited:
+                throttled = True
+                return None
+            except InvalidPlayerTag:
+                return None
+            except Exception:
+                logger.warning(
+                    "Trophy fetch failed for %s", player.player_tag, exc_info=True
+                )
+                return None
+        trophies = profile.get("trophies")
+        if trophies is None:
+            return None
+        return TrophyUpdate(player.user_id, player.player_tag, int(trophies))
+
+    results = await asyncio.gather(*(fetch(p) for p in players))
+    return [r for r in results if r is not None], throttled
+
+
+async def apply_updates(
+    db: AsyncSession, updates: Sequence[TrophyUpdate]
+) -> list[uuid.UUID]:
+    """Write trophy levels in one UPDATE ... FROM (VALUES ...).
+
+    Rows whose level is unchanged, or whose tag changed since the fetch,
+    are left alone. Returns the users that were updated.
+    """
+    if not updates:
+        return []
+    fresh = values(
+        column("user_id", UUID(as_uuid=True)),
+        column("player_tag", String(20)),
+        column("trophies", Integer()),
+        name="fresh",
+    ).data(sorted(updates))
+    result = await db.execute(
+        update(User)
+        .where(
+            User.user_id == fresh.c.user_id,
+            User.cr_player_tag == fresh.c.player_tag,
+            User.cr_player_verified.is_(True),
+            User.trophy_level.is_distinct_from(fresh.c.trophies),
+        )
+        # Explicit, since /me ETags are derived from updated_at
+        .values(trophy_level=fresh.c.trophies, updated_at=func.now())
+        .returning(User.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    changed = list(result.scalars())
+    await db.commit()
+    return changed
+
+
+class TrophyRefresher:
+    """Keeps User.trophy_level current, recent queue joiners first.
+
+    Each cycle spends TROPHY_REFRESH_BATCH_SIZE lookups: first on players
+    who joined the queue within TROPHY_REFRESH_RECENT_SECONDS and have not
+    been refreshed for a cycle, then on the next users of a keyset walk
+    over every verified account that wraps around at the end.
+    """
+
+    def __init__(self) -> None:
+        # user_id -> monotonic time of the last refresh from the recent list
+        self._refreshed: dict[uuid.UUID, float] = {}
+
+    async def run_cycle(self, redis: Redis) -> int:
+        batch = settings.TROPHY_REFRESH_BATCH_SIZE
+        now = time.monotonic()
+        self._refreshed = {
+            uid: at
+            for uid, at in self._refreshed.items()
+            if now - at < settings.TROPHY_REFRESH_RECENT_SECONDS
+        }
+
+        recent = [
+            uid
+            for uid in await _recent_user_ids(redis, batch)
+            if now - self._refreshed.get(uid, float("-inf"))
+            >= settings.TROPHY_REFRESH_INTERVAL_SECONDS
+        ]
+        cursor = await redis.get(CURSOR_KEY)
+        async with async_session() as db:
+            players = await _load_players(db, recent)
+            page_size = batch - len(players)
+            page = []
+            if page_size > 0:
+                page = await _load_page(
+                    db, uuid.UUID(cursor) if cursor else None, page_size
+                )
+
+        seen = {p.user_id for p in players}
+        players += [p for p in page if p.user_id not in seen]
+        if not players:
+            if page_size > 0:
+                await redis.delete(CURSOR_KEY)
+            return 0
+
+        updates, throttled = await fetch_trophies(players)
+        async with async_session() as db:
+            changed = await apply_updates(db, updates)
+        await user_cache_service.invalidate_users(redis, changed)
+
+        if throttled:
+            # Retry the same users once the budget allows
+            return len(changed)
+        for uid in recent:
+            self._refreshed[uid] = now
+        if page_size > 0 and len(page) < page_size:
+            # Reached the end of the walk; start over next cycle
+            await redis.delete(CURSOR_KEY)
+        elif page:
+            await redis.set(CURSOR_KEY, str(page[-1].user_id))
+        return len(changed)
+
+
+async def run_refresher() -> None:
+    """Background loop refreshing trophy levels from the CR API.
+
+    Only the worker holding the Redis lease refreshes, so the CR API budget
+    is spent once per cycle however many workers there are.
+    """
+    refresher = TrophyRefresher()
+    token = uuid.uuid4().hex
+    interval = settings.TROPHY_REFRESH_INTERVAL_SECONDS
+    lease_ms = int(interval * 3 * 1000)
+    while True:
+        redis = redis_client.redis_client
+        if redis is not None:
+            try:
+                if await lease.hold(redis, LEADER_KEY, token, lease_ms):
+                    await refresher.run_cycle(redis)
+            except Exception:
+                logger.exception("Trophy refresh failed")
+        await asyncio.sleep(interval)
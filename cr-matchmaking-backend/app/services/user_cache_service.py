@@ -0,0 +1,139 @@
+import json
+import uuid
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
+
+from redis.asyncio import Redis
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.config import settings
+from app.models.user import User
+from app.utils import redis_client
+from app.utils.metrics import USER_CACHE_HITS, USER_CACHE_MISSES
+from app.utils.ttl_cache import TTLCache
+
+USER_CACHE_PREFIX = "user:"
+# Bumped by every invalidation, so a row read before one is never cached
+# after it
+USER_GENERATION_PREFIX = "user_gen:"
+
+# Caches the payload only if the generation is still the one seen before
+# the row was read. ARGV: generation, payload, TTL. Returns 1 if cached.
+CACHE_IF_CURRENT_LUA = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# Columns needed to act as the authenticated principal. The password hash is
+# deliberately left out of both tiers.
+_DATETIME_FIELDS = ("created_at", "updated_at")
+_PLAIN_FIELDS = (
+    "email",
+    "username",
+    "cr_player_tag",
+    "cr_player_verified",
+    "trophy_level",
+)
+
+_local: TTLCache[uuid.UUID, dict[str, Any]] = TTLCache(
+    maxsize=settings.USER_CACHE_LOCAL_MAXSIZE,
+    ttl=settings.USER_CACHE_LOCAL_TTL_SECONDS,
+)
+
+
+def _to_payload(user: User) -> dict[str, Any]:
+    payload: dict[str, Any] = {"user_id": str(user.user_id)}
+    for field in _PLAIN_FIELDS:
+        payload[field] = getattr(user, field)
+    for field in _DATETIME_FIELDS:
+        payload[field] = getattr(user, field).isoformat()
+    return payload
+
+
+def _from_payload(payload: dict[str, Any]) -> User:
+    """Build a detached User from a cached payload.
+
+    A fresh instance is built on every call so requests never share state.
+    Columns that are not cached (password_hash) and the balance relationship
+    are left unloaded, so it is only for reading and is never attached to a
+    session.
+    """
+    user = User(
+        user_id=uuid.UUID(payload["user_id"]),
+        **{field: payload[field] for field in _PLAIN_FIELDS},
+        **{field: datetime.fromisoformat(payload[field]) for field in _DATETIME_FIELDS},
+    )
+    make_transient_to_detached(user)
+    return user
+
+
+async def get_user(redis: Redis, user_id: uuid.UUID) -> tuple[User | None, str]:
+    """The cached user, or None and the generation to pass to cache_user.
+
+    The generation must be taken before the row is read from the database.
+    """
+    payload = _local.get(user_id)
+    if payload is not None:
+        USER_CACHE_HITS.labels("local").inc()
+        return _from_payload(payload), ""
+    USER_CACHE_MISSES.labels("local").inc()
+
+    raw, generation = await redis.mget(
+        f"{USER_CACHE_PREFIX}{user_id}", f"{USER_GENERATION_PREFIX}{user_id}"
+    )
+    if raw is None:
+        USER_CACHE_MISSES.labels("redis").inc()
+        return None, generation or "0"
+    USER_CACHE_HITS.labels("redis").inc()
+
+    payload = json.loads(raw)
+    _local.set(user_id, payload)
+    return _from_payload(payload), ""
+
+
+async def cache_user(redis: Redis, user: User, generation: str) -> None:
+    """Cache a user read from the database after get_user missed.
+
+    Skipped if the user was invalidated since get_user returned
+    ``generation``, since the row may predate that change.
+    """
+    payload = _to_payload(user)
+    cache = redis_client.get_script(CACHE_IF_CURRENT_LUA)
+    cached = await cache(
+        keys=[
+            f"{USER_CACHE_PREFIX}{user.user_id}",
+            f"{USER_GENERATION_PREFIX}{user.user_id}",
+        ],
+        args=[generation, json.dumps(payload), settings.USER_CACHE_TTL_SECONDS],
+    )
+    if cached:
+        _local.set(user.user_id, payload)
+
+
+async def invalidate_user(redis: Redis, user_id: uuid.UUID) -> None:
+    """Drop a user from both tiers.
+
+    Other workers may keep serving their local copy for up to
+    USER_CACHE_LOCAL_TTL_SECONDS.
+    """
+    await invalidate_users(redis, (user_id,))
+
+
+async def invalidate_users(redis: Redis, user_ids: Iterable[uuid.UUID]) -> None:
+    """invalidate_user for many users with one Redis round trip."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            _local.pop(user_id)
+            pipe.delete(f"{USER_CACHE_PREFIX}{user_id}")
+            generation = f"{USER_GENERATION_PREFIX}{user_id}"
+            pipe.incr(generation)
+            # Outlives any read that could still be racing this change
+            pipe.expire(generation, settings.USER_CACHE_TTL_SECONDS)
+        await pipe.execute()
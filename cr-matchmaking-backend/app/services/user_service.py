@@ -3,11 +3,10 @@ import string
 import uuid
 
 from redis.asyncio import Redis
-from sqlalchemy import func, or_, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.match import MATCH_STATUS_COMPLETED, Match
-from app.models.user import User, UserBalance
+from app.models.user import User, UserBalance, UserStats
 from app.schemas.user import (
     LinkCRAccountRequest,
     LinkCRAccountResponse,
@@ -16,11 +15,13 @@ from app.schemas.user import (
     VerifyCRAccountRequest,
     VerifyCRAccountResponse,
 )
-from app.services import cr_api_service
+from app.services import cr_api_service, user_cache_service
 from app.utils.exceptions import AppException
 
 
-async def update_user(db: AsyncSession, user: User, update: UserUpdate) -> User:
+async def update_user(
+    db: AsyncSession, redis: Redis, user: User, update: UserUpdate
+) -> User:
     if update.username is not None:
         result = await db.execute(
             select(User).where(
@@ -37,9 +38,7 @@ async def update_user(db: AsyncSession, user: User, update: UserUpdate) -> User:
 
     if update.email is not None:
         result = await db.execute(
-            select(User).where(
-                User.email == update.email, User.user_id != user.user_id
-            )
+            select(User).where(User.email == update.email, User.user_id != user.user_id)
         )
         if result.scalar_one_or_none():
             raise AppException(
@@ -50,42 +49,42 @@ async def update_user(db: AsyncSession, user: User, update: UserUpdate) -> User:
         user.email = update.email
 
     await db.commit()
+    await user_cache_service.invalidate_user(redis, user.user_id)
     await db.refresh(user)
     return user
 
 
 async def get_stats(db: AsyncSession, user_id: uuid.UUID) -> UserStatsResponse:
-    total_result = await db.execute(
-        select(func.count(Match.match_id)).where(
-            or_(Match.player1_id == user_id, Match.player2_id == user_id),
-            Match.status == MATCH_STATUS_COMPLETED,
-        )
-    )
-    total = total_result.scalar() or 0
-
-    wins_result = await db.execute(
-        select(func.count(Match.match_id)).where(
-            Match.winner_id == user_id,
-            Match.status == MATCH_STATUS_COMPLETED,
+    # Both tables are keyed by user_id, so this is a single primary-key read
+    result = await db.execute(
+        select(
+            UserBalance.lifetime_wagered,
+            UserBalance.lifetime_won,
+            UserStats.total_matches,
+            UserStats.wins,
+            UserStats.losses,
+            UserStats.draws,
         )
+        .select_from(UserBalance)
+        .outerjoin(UserStats, UserStats.user_id == UserBalance.user_id)
+        .where(UserBalance.user_id == user_id)
     )
-    wins = wins_result.scalar() or 0
+    row = result.one_or_none()
+    if row is None:
+        return UserStatsResponse()
 
-    losses = total - wins
+    total = row.total_matches or 0
+    wins = row.wins or 0
     win_rate = (wins / total * 100) if total > 0 else 0.0
 
-    balance_result = await db.execute(
-        select(UserBalance).where(UserBalance.user_id == user_id)
-    )
-    balance = balance_result.scalar_one_or_none()
-
     return UserStatsResponse(
         total_matches=total,
         wins=wins,
-        losses=losses,
+        losses=row.losses or 0,
+        draws=row.draws or 0,
         win_rate=round(win_rate, 1),
-        lifetime_wagered=float(balance.lifetime_wagered) if balance else 0.0,
-        lifetime_won=float(balance.lifetime_won) if balance else 0.0,
+        lifetime_wagered=float(row.lifetime_wagered or 0),
+        lifetime_won=float(row.lifetime_won or 0),
     )
 
 
@@ -121,6 +120,7 @@ async def link_cr_account(
     user.cr_player_tag = request.player_tag
     user.cr_player_verified = False
     await db.commit()
+    await user_cache_service.invalidate_user(redis, user.user_id)
 
     return LinkCRAccountResponse(
         player_tag=request.player_tag,
@@ -150,7 +150,8 @@ async def verify_cr_account(
             status_code=400,
         )
 
-    player_data = await cr_api_service.get_player(player_tag)
+    # The player has just renamed themselves, so a cached profile is stale
+    player_data = await cr_api_service.get_player(player_tag, use_cache=False)
     player_name = player_data.get("name", "")
 
     if expected_code not in player_name:
@@ -165,6 +166,7 @@ async def verify_cr_account(
     user.cr_player_verified = True
     user.trophy_level = trophies
     await db.commit()
+    await user_cache_service.invalidate_user(redis, user.user_id)
     await db.refresh(user)
 
     await redis.delete(f"cr_verify:{user.user_id}")
@@ -0,0 +1,92 @@
+import asyncio
+
+from app.config import settings
+from app.utils import redis_client
+from app.utils.exceptions import CRAPIRateLimited
+from app.utils.metrics import (
+    CR_API_QUOTA_THROTTLED,
+    CR_API_QUOTA_WAIT_SECONDS,
+    CR_API_QUOTA_WAITING,
+)
+
+BUCKET_KEY = "cr_api:quota"
+
+# Priority classes, highest first. A class may only take a token while the
+# bucket holds more than its reserve, so lower classes back off first.
+PRIORITY_BATTLE = "battle"
+PRIORITY_PROFILE = "profile"
+PRIORITY_BACKGROUND = "background"
+
+# Token bucket shared by every worker. Uses the Redis clock so workers with
+# skewed clocks still agree on the refill. Returns {allowed, wait_ms}.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local allowed = 0
+local wait_ms = 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait_ms = math.ceil((reserve + 1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return {allowed, wait_ms}
+"""
+
+
+def _reserve(priority: str) -> float:
+    burst = settings.CR_API_BURST
+    if priority == PRIORITY_BATTLE:
+        return 0.0
+    if priority == PRIORITY_PROFILE:
+        return burst * settings.CR_API_PROFILE_RESERVE_FRACTION
+    return burst * settings.CR_API_BACKGROUND_RESERVE_FRACTION
+
+
+async def acquire(
+    priority: str = PRIORITY_PROFILE, timeout: float | None = None
+) -> None:
+    """Wait for a CR API token, or raise CRAPIRateLimited once the deadline passes."""
+    if redis_client.redis_client is None:
+        return
+
+    script = redis_client.get_script(TOKEN_BUCKET_LUA)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + (
+        timeout if timeout is not None else settings.CR_API_QUOTA_TIMEOUT_SECONDS
+    )
+    args = [settings.CR_API_RATE_PER_SECOND, settings.CR_API_BURST, _reserve(priority)]
+
+    CR_API_QUOTA_WAITING.labels(priority).inc()
+    try:
+        while True:
+            allowed, wait_ms = await script(keys=[BUCKET_KEY], args=args)
+            if allowed:
+                return
+            wait = wait_ms / 1000
+            remaining = deadline - loop.time()
+            if wait > remaining:
+                CR_API_QUOTA_THROTTLED.labels(priority).inc()
+                raise CRAPIRateLimited(retry_after=wait)
+            await asyncio.sleep(wait)
+    finally:
+        CR_API_QUOTA_WAITING.labels(priority).dec()
+        CR_API_QUOTA_WAIT_SECONDS.labels(priority).inc(loop.time() - started)
@@ -15,6 +15,15 @@ class AppException(Exception):
         self.details = details or {}
         super().__init__(message)
 
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "error": {
+                "code": self.code,
+                "message": self.message,
+                "details": self.details,
+            }
+        }
+
 
 class InsufficientBalance(AppException):
     def __init__(self, available: float, required: float):
@@ -82,3 +91,49 @@ class RateLimitExceeded(AppException):
             message="Too many requests",
             status_code=429,
         )
+
+
+class CRAPIRateLimited(AppException):
+    def __init__(self, retry_after: float | None = None):
+        super().__init__(
+            code="CR_API_BUSY",
+            message="Clash Royale API is busy, try again shortly",
+            status_code=503,
+            details={"retry_after": retry_after} if retry_after is not None else {},
+        )
+
+
+class InvalidCursor(AppException):
+    def __init__(self):
+        super().__init__(
+            code="INVALID_CURSOR",
+            message="Pagination cursor is malformed or expired",
+            status_code=400,
+        )
+
+
+class InvalidIdempotencyKey(AppException):
+    def __init__(self):
+        super().__init__(
+            code="INVALID_IDEMPOTENCY_KEY",
+            message="Idempotency-Key must be 1 to 255 printable characters",
+            status_code=400,
+        )
+
+
+class IdempotencyKeyReused(AppException):
+    def __init__(self):
+        super().__init__(
+            code="IDEMPOTENCY_KEY_REUSED",
+            message="Idempotency-Key was already used with a different request",
+            status_code=422,
+        )
+
+
+class IdempotentRequestInProgress(AppException):
+    def __init__(self):
+        super().__init__(
+            code="REQUEST_IN_PROGRESS",
+            message="A request with this Idempotency-Key is still being processed",
+            status_code=409,
+        )
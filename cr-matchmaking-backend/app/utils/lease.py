@@ -0,0 +1,24 @@
+from redis.asyncio import Redis
+
+from app.utils import redis_client
+
+# Extends the lease only if the caller still holds it
+RENEW_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+async def hold(redis: Redis, key: str, token: str, lease_ms: int) -> bool:
+    """Take or renew a Redis lease; True while ``token`` holds it.
+
+    Background loops that must run on only one worker call this every
+    cycle. The holder keeps renewing, so leadership stays put until it
+    stops for longer than ``lease_ms``.
+    """
+    if await redis.set(key, token, nx=True, px=lease_ms):
+        return True
+    renew = redis_client.get_script(RENEW_LEASE_LUA)
+    return bool(await renew(keys=[key], args=[token, lease_ms]))
@@ -0,0 +1,186 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event as sa_event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Set by the process manager when several uvicorn workers share one scrape
+# target; each worker then writes its samples to files in this directory.
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# HTTP requests
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status code",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled",
+    multiprocess_mode="livesum",
+)
+
+# Database connection pools
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections open beyond pool_size (negative while the pool is filling)",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+
+# Redis
+REDIS_COMMAND_SECONDS = Histogram(
+    "redis_command_duration_seconds",
+    "Redis command round-trip latency",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+
+# CR API client
+CR_API_REQUEST_SECONDS = Histogram(
+    "cr_api_request_duration_seconds",
+    "CR API request latency, excluding time spent waiting for quota",
+    ["endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+CR_API_REQUESTS = Counter(
+    "cr_api_requests_total",
+    "CR API requests by outcome",
+    ["endpoint", "outcome"],
+)
+
+# CR API quota governor
+CR_API_QUOTA_WAITING = Gauge(
+    "cr_api_quota_waiting",
+    "Callers currently waiting for a CR API token",
+    ["priority"],
+    multiprocess_mode="livesum",
+)
+CR_API_QUOTA_THROTTLED = Counter(
+    "cr_api_quota_throttled_total",
+    "CR API calls rejected because no token was available before the deadline",
+    ["priority"],
+)
+CR_API_QUOTA_WAIT_SECONDS = Counter(
+    "cr_api_quota_wait_seconds_total",
+    "Total time callers spent waiting for CR API tokens",
+    ["priority"],
+)
+
+# Password hashing pool
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_seconds",
+    "Time spent hashing or verifying a password in the worker pool",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.15, 0.2, 0.25, 0.35, 0.5, 1.0, 2.5),
+)
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight",
+    "Password hashes currently running in the worker pool",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_QUEUED = Gauge(
+    "password_hash_queued",
+    "Requests waiting for a free password hashing slot",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Requests rejected because no hashing slot freed up in time",
+)
+
+# Authenticated-user cache
+USER_CACHE_HITS = Counter(
+    "user_cache_hits_total",
+    "Authenticated-user lookups served from the cache",
+    ["tier"],
+)
+USER_CACHE_MISSES = Counter(
+    "user_cache_misses_total",
+    "Authenticated-user lookups that missed a cache tier",
+    ["tier"],
+)
+
+# Background jobs (queue-wide values, so workers agree and the max is kept)
+JOBS_READY = Gauge(
+    "jobs_ready",
+    "Jobs on the stream not yet acknowledged, including ones being run",
+    multiprocess_mode="livemax",
+)
+JOBS_DELAYED = Gauge(
+    "jobs_delayed",
+    "Jobs waiting for their retry backoff to elapse",
+    multiprocess_mode="livemax",
+)
+JOBS_DEAD = Gauge(
+    "jobs_dead",
+    "Jobs in the dead-letter stream",
+    multiprocess_mode="livemax",
+)
+JOB_OLDEST_AGE_SECONDS = Gauge(
+    "job_oldest_age_seconds",
+    "Age of the oldest unacknowledged job on the stream (queue lag)",
+    multiprocess_mode="livemax",
+)
+JOBS_PROCESSED = Counter(
+    "jobs_processed_total",
+    "Job deliveries by kind and outcome",
+    ["kind", "outcome"],
+)
+JOBS_RECLAIMED = Counter(
+    "jobs_reclaimed_total",
+    "Jobs taken over after exceeding the visibility timeout",
+)
+JOB_SECONDS = Histogram(
+    "job_duration_seconds",
+    "Time spent running a job handler",
+    ["kind"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+def instrument_pool(engine: AsyncEngine, name: str) -> None:
+    """Track checked-out and overflow connections of an engine's pool."""
+    pool = engine.sync_engine.pool
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+    overflow = DB_POOL_OVERFLOW.labels(name)
+
+    def _update(*_: object) -> None:
+        # Only QueuePool tracks these; other pool classes are left at zero
+        if hasattr(pool, "checkedout"):
+            checked_out.set(pool.checkedout())
+            overflow.set(pool.overflow())
+
+    sa_event.listen(pool, "checkout", _update)
+    sa_event.listen(pool, "checkin", _update)
+
+
+def render() -> tuple[bytes, str]:
+    """Exposition for a scrape, aggregated across workers when multiprocess."""
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the multiprocess directory."""
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,25 @@
+import base64
+import uuid
+from datetime import datetime
+
+from app.utils.exceptions import InvalidCursor
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    """Opaque cursor for the (created_at, id) keyset position of a row."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = raw.decode().split("|")
+        position = datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except ValueError:
+        # binascii.Error and UnicodeDecodeError are ValueErrors too
+        raise InvalidCursor() from None
+    if position[0].tzinfo is not None:
+        # created_at columns are naive; asyncpg rejects comparing the two
+        raise InvalidCursor()
+    return position
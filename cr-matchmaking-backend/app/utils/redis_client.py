@@ -1,15 +1,34 @@
+import time
 from collections.abc import AsyncGenerator
+from typing import Any
 
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
 
 from app.config import settings
+from app.utils import metrics
+
+
+class InstrumentedRedis(Redis):
+    """Redis client that records the latency of every command it sends."""
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            metrics.REDIS_COMMAND_SECONDS.labels(str(args[0]).upper()).observe(
+                time.perf_counter() - start
+            )
+
 
 redis_client: Redis | None = None
+_scripts: dict[str, AsyncScript] = {}
 
 
 async def init_redis() -> Redis:
     global redis_client
-    redis_client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    redis_client = InstrumentedRedis.from_url(settings.REDIS_URL, decode_responses=True)
     return redis_client
 
 
@@ -18,6 +37,18 @@ async def close_redis() -> None:
     if redis_client is not None:
         await redis_client.close()
         redis_client = None
+    _scripts.clear()
+
+
+def get_script(source: str) -> AsyncScript:
+    """Return a Lua script registered on the shared client (EVALSHA + fallback)."""
+    if redis_client is None:
+        raise RuntimeError("Redis client not initialized")
+    script = _scripts.get(source)
+    if script is None:
+        script = redis_client.register_script(source)
+        _scripts[source] = script
+    return script
 
 
 async def get_redis() -> AsyncGenerator[Redis, None]:
@@ -0,0 +1,114 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request issued more statements than its route's query budget."""
+
+
+class QueryStats:
+    """Statements issued while handling one request."""
+
+    __slots__ = ("count", "seconds", "statements", "flagged")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter[str] = Counter()
+        self.flagged: set[str] = set()
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("sql_query_stats", default=None)
+
+
+def start_request() -> QueryStats:
+    """Start counting statements for the current request context."""
+    stats = QueryStats()
+    _current.set(stats)
+    return stats
+
+
+def current_stats() -> QueryStats | None:
+    return _current.get()
+
+
+def param_shape(parameters: Any) -> Any:
+    """Bound parameters with values replaced by type names, safe to log."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: one row's shape is enough
+            return [param_shape(parameters[0]), f"x{len(parameters)}"]
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(
+    conn: Any,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    # Kept on the execution context rather than the connection, so a
+    # statement that fails (and never reaches the after hook) leaves nothing
+    # behind for the next one to pick up
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn: Any,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+
+    if elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms): %s params=%s",
+            elapsed * 1000,
+            statement,
+            param_shape(parameters),
+        )
+
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.count += 1
+    stats.seconds += elapsed
+    stats.statements[statement] += 1
+    if (
+        stats.statements[statement] >= settings.SQL_REPEATED_STATEMENT_THRESHOLD
+        and statement not in stats.flagged
+    ):
+        stats.flagged.add(statement)
+        logger.warning(
+            "Statement repeated %d times in one request (possible N+1): %s",
+            stats.statements[statement],
+            statement,
+        )
+
+
+def install(engine: AsyncEngine) -> None:
+    """Time every statement the engine executes."""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
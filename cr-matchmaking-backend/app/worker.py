@@ -0,0 +1,51 @@
+"""Run job consumers outside the API process.
+
+Usage: poetry run python -m app.worker [consumers]
+
+Each consumer joins the same Redis Streams group as the ones started by the
+API lifespan, so throughput scales with the number of consumers running.
+"""
+
+import asyncio
+import logging
+import signal
+import sys
+
+# Models so relationships resolve, and every module that registers handlers
+import app.models  # noqa: F401
+import app.services.battle_poller_service  # noqa: F401
+from app import database
+from app.database import engine
+from app.services import cr_api_service, job_service
+from app.utils import metrics
+from app.utils.redis_client import close_redis, init_redis
+
+
+async def main(consumers: int) -> None:
+    await init_redis()
+    await cr_api_service.init_client()
+    tasks = [asyncio.create_task(job_service.run_worker()) for _ in range(consumers)]
+
+    def stop() -> None:
+        # In-flight jobs are reclaimed by other consumers after the
+        # visibility timeout
+        for task in tasks:
+            task.cancel()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop)
+    try:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await cr_api_service.close_client()
+        await close_redis()
+        await engine.dispose()
+        if database.replica_engine is not None:
+            await database.replica_engine.dispose()
+        metrics.mark_process_dead()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1))
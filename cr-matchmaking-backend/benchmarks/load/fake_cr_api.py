@@ -0,0 +1,74 @@
+"""Local stand-in for the Clash Royale API.
+
+Serves deterministic player profiles and battle logs for any tag. The load
+runner renames players through the control endpoints so the link/verify
+flow can complete.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+app = FastAPI()
+
+_names: dict[str, str] = {}
+_battles: dict[str, list[dict]] = {}
+
+
+class PlayerName(BaseModel):
+    name: str
+
+
+class Battle(BaseModel):
+    opponent_tag: str
+    # Equal crowns are a draw
+    crowns: int
+    opponent_crowns: int
+
+
+def _trophies(tag: str) -> int:
+    # Stable per tag, spread over the brackets matchmaking pairs within
+    return 3000 + int(hashlib.sha256(tag.encode()).hexdigest()[:4], 16) % 4000
+
+
+@app.get("/v1/players/{tag}")
+async def get_player(tag: str) -> dict:
+    if not tag.startswith("#"):
+        raise HTTPException(status_code=404)
+    return {
+        "tag": tag,
+        "name": _names.get(tag, f"Player{tag[1:]}"),
+        "trophies": _trophies(tag),
+        "expLevel": 50,
+    }
+
+
+@app.get("/v1/players/{tag}/battlelog")
+async def get_battlelog(tag: str) -> list[dict]:
+    return _battles.get(tag, [])
+
+
+@app.put("/_control/players/{tag}/name", status_code=204)
+async def set_name(tag: str, body: PlayerName) -> None:
+    _names[tag] = body.name
+
+
+@app.post("/_control/players/{tag}/battles", status_code=204)
+async def add_battle(tag: str, body: Battle) -> None:
+    battle_time = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.000Z")
+    for player, opponent, crowns, opponent_crowns in (
+        (tag, body.opponent_tag, body.crowns, body.opponent_crowns),
+        (body.opponent_tag, tag, body.opponent_crowns, body.crowns),
+    ):
+        # The real API returns newest first
+        _battles.setdefault(player, []).insert(
+            0,
+            {
+                "type": "friendly",
+                "battleTime": battle_time,
+                "team": [{"tag": player, "crowns": crowns}],
+                "opponent": [{"tag": opponent, "crowns": opponent_crowns}],
+            },
+        )
@@ -0,0 +1,356 @@
+"""End-to-end load test against a locally booted app.
+
+Boots app.main:app with uvicorn against the local Postgres and Redis from
+.env, with the CR API replaced by the fake in this package. Each virtual
+user registers, links and verifies a CR account, gets a seeded balance,
+then loops over a weighted mix of requests until the duration is up.
+The mix includes registering throwaway accounts and re-linking and
+verifying the user's CR account, so password hashing and CR API calls are
+measured under steady load and not only during setup. Latency percentiles
+and throughput per endpoint are written as JSON so releases can be
+compared.
+
+Usage: poetry run python -m benchmarks.load.run \\
+    [--users 50] [--duration 60] [--workers 1] \\
+    [--mix me=35,stats=20,queue=30,login=5,register=5,verify=5] \\
+    [--output load-results.json]
+
+Use a scratch database: the run creates users, matches and transactions.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+
+import httpx
+import uvicorn
+from sqlalchemy import update
+
+from app.database import async_session
+from app.models.user import UserBalance
+from benchmarks.load import fake_cr_api
+
+PASSWORD = "load-test-password"
+SEED_BALANCE = 1000
+BET_AMOUNT = 5.0
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def call(
+        self,
+        client: httpx.AsyncClient,
+        name: str,
+        method: str,
+        url: str,
+        ok: tuple[int, ...] = (200, 201, 204),
+        **kwargs,
+    ) -> httpx.Response:
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code not in ok:
+            self.errors[name] += 1
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        results = {}
+        for name, samples in sorted(self.latencies.items()):
+            samples.sort()
+            # quantiles needs two samples; a single one is its own percentile
+            cuts = (
+                statistics.quantiles(samples, n=100, method="inclusive")
+                if len(samples) > 1
+                else samples * 99
+            )
+            results[name] = {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(cuts[49] * 1000, 2),
+                "p95_ms": round(cuts[94] * 1000, 2),
+                "p99_ms": round(cuts[98] * 1000, 2),
+            }
+        return results
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, cr_client: httpx.AsyncClient):
+        self.client = client
+        self.cr_client = cr_client
+        suffix = uuid.uuid4().hex[:10]
+        self.email = f"load-{suffix}@example.com"
+        self.username = f"load_{suffix}"
+        self.player_tag = f"#{suffix.upper()}"
+        self.headers: dict[str, str] = {}
+        self.user_id: uuid.UUID | None = None
+
+    async def _register(
+        self, rec: Recorder, email: str, username: str
+    ) -> httpx.Response:
+        return await rec.call(
+            self.client,
+            "POST /api/auth/register",
+            "POST",
+            "/api/auth/register",
+            json={"email": email, "password": PASSWORD, "username": username},
+        )
+
+    async def setup(self, rec: Recorder) -> None:
+        response = await self._register(rec, self.email, self.username)
+        body = response.json()
+        self.user_id = uuid.UUID(body["user"]["user_id"])
+        self.headers = {"Authorization": f"Bearer {body['token']}"}
+        await self.verify(rec)
+
+    async def register(self, rec: Recorder) -> None:
+        # A throwaway account each time; the virtual user keeps its own
+        suffix = uuid.uuid4().hex[:10]
+        await self._register(rec, f"load-{suffix}@example.com", f"load_{suffix}")
+
+    async def verify(self, rec: Recorder) -> None:
+        """Link the user's CR account and verify it with a fresh code."""
+        response = await rec.call(
+            self.client,
+            "POST /api/users/me/link-cr",
+            "POST",
+            "/api/users/me/link-cr",
+            json={"player_tag": self.player_tag},
+            headers=self.headers,
+        )
+        code = response.json()["verification_code"]
+        await self.cr_client.put(
+            f"/_control/players/{self.player_tag}/name",
+            json={"name": f"Load {code}"},
+        )
+        await rec.call(
+            self.client,
+            "POST /api/users/me/verify-cr",
+            "POST",
+            "/api/users/me/verify-cr",
+            json={"verification_code": code},
+            headers=self.headers,
+        )
+
+    async def me(self, rec: Recorder) -> None:
+        await rec.call(
+            self.client,
+            "GET /api/users/me",
+            "GET",
+            "/api/users/me",
+            headers=self.headers,
+        )
+
+    async def stats(self, rec: Recorder) -> None:
+        await rec.call(
+            self.client,
+            "GET /api/users/me/stats",
+            "GET",
+            "/api/users/me/stats",
+            headers=self.headers,
+        )
+
+    async def login(self, rec: Recorder) -> None:
+        await rec.call(
+            self.client,
+            "POST /api/auth/login",
+            "POST",
+            "/api/auth/login",
+            json={"email": self.email, "password": PASSWORD},
+        )
+
+    async def queue(self, rec: Recorder) -> None:
+        # Another virtual user may pair with us at any point, so already
+        # queued, not queued and insufficient balance are expected outcomes
+        await rec.call(
+            self.client,
+            "POST /api/matchmaking/queue",
+            "POST",
+            "/api/matchmaking/queue",
+            ok=(201, 400, 409),
+            json={"bet_amount": BET_AMOUNT},
+            headers=self.headers,
+        )
+        await rec.call(
+            self.client,
+            "GET /api/matchmaking/queue/status",
+            "GET",
+            "/api/matchmaking/queue/status",
+            headers=self.headers,
+        )
+        await rec.call(
+            self.client,
+            "DELETE /api/matchmaking/queue",
+            "DELETE",
+            "/api/matchmaking/queue",
+            ok=(204, 404),
+            headers=self.headers,
+        )
+
+
+def _parse_mix(spec: str) -> dict[str, int]:
+    mix = {}
+    for part in spec.split(","):
+        name, weight = part.split("=")
+        if name not in ("me", "stats", "queue", "login", "register", "verify"):
+            raise SystemExit(f"unknown mix entry: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+async def _seed_balances(user_ids: list[uuid.UUID]) -> None:
+    async with async_session() as db:
+        await db.execute(
+            update(UserBalance)
+            .where(UserBalance.user_id.in_(user_ids))
+            .values(balance=SEED_BALANCE)
+        )
+        await db.commit()
+
+
+async def _serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server
+
+
+async def _wait_healthy(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit("app did not become healthy")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    cr_server = await _serve(fake_cr_api.app, args.cr_port)
+
+    env = {
+        **os.environ,
+        "CR_API_URL": f"http://127.0.0.1:{args.cr_port}/v1",
+        # Limits are per client, and every virtual user shares one address
+        "RATE_LIMIT_IP_REQUESTS": "100000000",
+        "RATE_LIMIT_AUTH_REQUESTS": "100000000",
+        "RATE_LIMIT_REQUESTS": "100000000",
+        "CR_API_RATE_PER_SECOND": "100000",
+        "CR_API_BURST": "100000",
+    }
+    app_proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(args.port),
+            "--workers",
+            str(args.workers),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    # Setup traffic is reported separately from the timed mix
+    setup_rec = Recorder()
+    rec = Recorder()
+    try:
+        await _wait_healthy(base_url)
+        limits = httpx.Limits(max_connections=args.users)
+        async with (
+            httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client,
+            httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.cr_port}") as cr,
+        ):
+            vusers = [VirtualUser(client, cr) for _ in range(args.users)]
+            start = time.perf_counter()
+            await asyncio.gather(*(v.setup(setup_rec) for v in vusers))
+            setup_elapsed = time.perf_counter() - start
+            await _seed_balances([v.user_id for v in vusers if v.user_id])
+
+            mix = _parse_mix(args.mix)
+            names, weights = list(mix), list(mix.values())
+            deadline = time.monotonic() + args.duration
+
+            async def drive(vuser: VirtualUser) -> None:
+                actions: dict[str, Callable[[Recorder], Awaitable[None]]] = {
+                    "me": vuser.me,
+                    "stats": vuser.stats,
+                    "login": vuser.login,
+                    "queue": vuser.queue,
+                    "register": vuser.register,
+                    "verify": vuser.verify,
+                }
+                while time.monotonic() < deadline:
+                    await actions[random.choices(names, weights)[0]](rec)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(drive(v) for v in vusers))
+            elapsed = time.perf_counter() - start
+    finally:
+        app_proc.terminate()
+        app_proc.wait()
+        cr_server.should_exit = True
+
+    return {
+        "config": {
+            "users": args.users,
+            "duration": args.duration,
+            "workers": args.workers,
+            "mix": args.mix,
+        },
+        "setup": setup_rec.summary(setup_elapsed),
+        "endpoints": rec.summary(elapsed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50, help="concurrent users")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument(
+        "--mix", default="me=35,stats=20,queue=30,login=5,register=5,verify=5"
+    )
+    parser.add_argument("--output", default="load-results.json")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--cr-port", type=int, default=8101)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    for name, row in results["endpoints"].items():
+        print(
+            f"{name:40} {row['rps']:9.1f} rps  p50 {row['p50_ms']:8.2f} ms  "
+            f"p95 {row['p95_ms']:8.2f} ms  p99 {row['p99_ms']:8.2f} ms  "
+            f"errors {row['errors']}"
+        )
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import uuid
+from collections.abc import Awaitable, Callable, Coroutine
+from datetime import datetime, timezone
+from typing import Any, TypeVar
+
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.requests import Request
+
+from app.dependencies import get_current_user
+from app.main import app_exception_handler
+from app.models.user import User
+from app.schemas.user import UserResponse
+from app.services import auth_service, user_cache_service
+from app.utils import redis_client
+from app.utils.exceptions import InsufficientBalance
+
+T = TypeVar("T")
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine that never suspends, without an event loop.
+
+    Keeps loop scheduling out of the timings; stubs must not await real I/O.
+    """
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("benchmarked coroutine suspended")
+
+
+class StubResult:
+    def __init__(self, row: object):
+        self.row = row
+
+    def scalar_one_or_none(self) -> object:
+        return self.row
+
+
+class StubSession:
+    def __init__(self, user: User):
+        self.user = user
+        self.info: dict = {}
+
+    def add(self, instance: object) -> None:
+        pass
+
+    async def execute(self, statement: object) -> StubResult:
+        return StubResult(self.user)
+
+
+class StubRedis:
+    async def mget(self, *keys: str) -> list[None]:
+        return [None] * len(keys)
+
+    def register_script(self, source: str) -> Callable[..., Awaitable[int]]:
+        async def script(keys: list[str], args: list[object]) -> int:
+            return 1
+
+        return script
+
+
+def _user() -> User:
+    now = datetime.now(timezone.utc)
+    return User(
+        user_id=uuid.uuid4(),
+        email="bench@example.com",
+        username="bench_user",
+        password_hash="x",
+        cr_player_tag="#ABC123",
+        cr_player_verified=True,
+        trophy_level=5000,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def bench_create_access_token(bench):
+    user_id = uuid.uuid4()
+    bench("create_access_token", lambda: auth_service.create_access_token(user_id))
+
+
+def bench_decode_access_token_uncached(bench):
+    token = auth_service.create_access_token(uuid.uuid4())
+
+    def decode() -> None:
+        auth_service._token_cache.clear()
+        auth_service.decode_access_token(token)
+
+    bench("decode_access_token_uncached", decode)
+
+
+def bench_decode_access_token_cached(bench):
+    token = auth_service.create_access_token(uuid.uuid4())
+    bench("decode_access_token_cached", lambda: auth_service.decode_access_token(token))
+
+
+def bench_user_response_from_orm(bench):
+    user = _user()
+    bench("user_response_model_validate", lambda: UserResponse.model_validate(user))
+
+
+def bench_app_exception_handler(bench):
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    exc = InsufficientBalance(3.5, 10.0)
+    bench(
+        "app_exception_handler",
+        lambda: run_sync(app_exception_handler(request, exc)).body,
+    )
+
+
+def bench_get_current_user_cache_miss(bench, monkeypatch):
+    user = _user()
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=auth_service.create_access_token(user.user_id)
+    )
+    db, redis = StubSession(user), StubRedis()
+    # cache_user runs its Lua script through the shared client
+    monkeypatch.setattr(redis_client, "redis_client", redis)
+    monkeypatch.setattr(redis_client, "_scripts", {})
+
+    def resolve() -> None:
+        user_cache_service._local.clear()
+        run_sync(get_current_user(credentials, db, redis))
+
+    bench("get_current_user_cache_miss", resolve)
+
+
+def bench_get_current_user_local_hit(bench, monkeypatch):
+    user = _user()
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=auth_service.create_access_token(user.user_id)
+    )
+    db, redis = StubSession(user), StubRedis()
+    monkeypatch.setattr(redis_client, "redis_client", redis)
+    monkeypatch.setattr(redis_client, "_scripts", {})
+    run_sync(get_current_user(credentials, db, redis))
+
+    bench(
+        "get_current_user_local_hit",
+        lambda: run_sync(get_current_user(credentials, db, redis)),
+    )
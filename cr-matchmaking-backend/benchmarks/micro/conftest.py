@@ -0,0 +1,96 @@
+"""Timing harness for the hot-path microbenchmarks.
+
+Usage: poetry run pytest benchmarks/micro [--update-baselines]
+                                          [--regression-threshold 1.3]
+
+Each benchmark is timed best-of-N with the GC off, and expressed relative to
+a fixed pure-Python calibration loop timed in the same session, so stored
+baselines carry over between machines of different speed. A benchmark fails
+when its relative cost exceeds its baseline by more than the threshold,
+or has no baseline at all. Record baselines with --update-baselines and
+commit baselines.json.
+"""
+
+import json
+import timeit
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+REPEAT = 7
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--update-baselines",
+        action="store_true",
+        help="overwrite stored baselines with this run's results",
+    )
+    parser.addoption(
+        "--regression-threshold",
+        type=float,
+        default=1.3,
+        help="fail when a benchmark is this many times slower than baseline",
+    )
+
+
+def measure(func: Callable[[], object]) -> float:
+    """Best per-call time in seconds."""
+    func()  # warm caches and lazy imports
+    # Loops enough for each repeat to take at least 0.2s
+    number, _ = timeit.Timer(func).autorange()
+    return min(timeit.repeat(func, number=number, repeat=REPEAT)) / number
+
+
+def _calibration_loop() -> int:
+    total = 0
+    for i in range(1000):
+        total += i * i % 7
+    return total
+
+
+class Bench:
+    def __init__(self, config: pytest.Config, baselines: dict[str, float]):
+        self.update = config.getoption("--update-baselines")
+        self.threshold = config.getoption("--regression-threshold")
+        self.baselines = baselines
+        self.dirty = False
+        self.unit = measure(_calibration_loop)
+
+    def __call__(self, name: str, func: Callable[[], object]) -> float:
+        per_call = measure(func)
+        relative = per_call / self.unit
+        baseline = self.baselines.get(name)
+        print(
+            f"\n{name}: {per_call * 1_000_000:.2f} us/call "
+            f"({relative:.4f} calibration units, baseline {baseline})"
+        )
+        if self.update:
+            self.baselines[name] = round(relative, 6)
+            self.dirty = True
+        elif baseline is None:
+            pytest.fail(
+                f"{name} has no baseline in {BASELINES_PATH.name}; record one "
+                "with --update-baselines and commit it"
+            )
+        elif relative > baseline * self.threshold:
+            pytest.fail(
+                f"{name} regressed: {relative:.4f} units vs baseline "
+                f"{baseline:.4f} (threshold x{self.threshold})"
+            )
+        return per_call
+
+
+@pytest.fixture(scope="session")
+def bench(pytestconfig: pytest.Config):
+    baselines = (
+        json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+    )
+    harness = Bench(pytestconfig, baselines)
+    yield harness
+    if harness.dirty:
+        BASELINES_PATH.write_text(
+            json.dumps(dict(sorted(baselines.items())), indent=2) + "\n"
+        )
@@ -0,0 +1,113 @@
+"""Response serialization cost: FastAPI's response_model path vs orm_response.
+
+Usage: poetry run python -m benchmarks.orm_json [--items 50]
+
+The current path validates the ORM row into UserResponse in the handler,
+then FastAPI validates it again against response_model, dumps it to
+JSON-compatible data and encodes it with json.dumps. The list case stands
+in for list endpoints returning --items rows.
+"""
+
+import argparse
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import BaseModel
+
+from app.models.user import User
+from app.schemas.user import UserResponse
+from app.utils.serialization import orm_response
+
+
+class UserListResponse(BaseModel):
+    users: list[UserResponse]
+
+
+class _Rows:
+    def __init__(self, users: list[User]):
+        self.users = users
+
+
+def _user(i: int) -> User:
+    now = datetime.now(timezone.utc)
+    return User(
+        user_id=uuid.uuid4(),
+        email=f"bench{i}@example.com",
+        username=f"bench_user_{i}",
+        password_hash="x",
+        cr_player_tag=f"#TAG{i}",
+        cr_player_verified=True,
+        trophy_level=4000 + i,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def _per_call_us(stmt, number: int) -> float:
+    runs = timeit.repeat(stmt, number=number, repeat=5)
+    return min(runs) / number * 1_000_000
+
+
+def _run_sync(coro):
+    # serialize_response never suspends, so no event loop is needed
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("serialize_response suspended")
+
+
+def _response_model_path(schema: type[BaseModel], handler):
+    """What a route does today: handler validates, FastAPI re-validates."""
+    field = create_model_field(name="Response", type_=schema, mode="serialization")
+
+    def render() -> bytes:
+        data = _run_sync(serialize_response(field=field, response_content=handler()))
+        return JSONResponse(data).body
+
+    return render
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    user = _user(0)
+    rows = _Rows([_user(i) for i in range(args.items)])
+
+    cases = {
+        "GET /api/users/me": (
+            _response_model_path(
+                UserResponse, lambda: UserResponse.model_validate(user)
+            ),
+            lambda: orm_response(UserResponse, user).body,
+            args.number,
+        ),
+        f"list of {args.items}": (
+            _response_model_path(
+                UserListResponse,
+                lambda: UserListResponse(
+                    users=[UserResponse.model_validate(u) for u in rows.users]
+                ),
+            ),
+            lambda: orm_response(UserListResponse, rows).body,
+            max(args.number // args.items, 10),
+        ),
+    }
+    for name, (current, direct, number) in cases.items():
+        before = _per_call_us(current, number)
+        after = _per_call_us(direct, number)
+        print(
+            f"{name:20} response_model {before:9.2f} us   "
+            f"orm_response {after:9.2f} us   ({before / after:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import uuid
+from contextlib import asynccontextmanager
+
+from app.services import matchmaking_service
+from app.utils import redis_client
+
+
+async def test_sweep_keeps_pairing_after_a_pair_fails(monkeypatch):
+    players = [uuid.uuid4() for _ in range(6)]
+    flat = []
+    for player_id in players:
+        flat += [str(player_id), 5000, 1000]
+
+    async def sweep(keys, args):
+        return flat
+
+    @asynccontextmanager
+    async def session():
+        yield None
+
+    paired = []
+
+    async def pair(db, redis, bracket, first, second):
+        paired.append(first.user_id)
+        if len(paired) == 2:
+            raise RuntimeError("escrow update failed")
+        return uuid.uuid4(), []
+
+    monkeypatch.setattr(redis_client, "get_script", lambda source: sweep)
+    monkeypatch.setattr(matchmaking_service, "async_session", session)
+    monkeypatch.setattr(matchmaking_service, "_pair", pair)
+
+    created = await matchmaking_service.sweep_bracket(None, "10")
+
+    assert paired == players[::2]
+    assert created == 2